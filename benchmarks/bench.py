@@ -0,0 +1,291 @@
+# -*- coding:utf-8 -*-
+
+"""
+benchmark of planning and evaluation, on synthetic schema (sqlite, local disk)
+
+  $ python benchmarks/bench.py  # comparing with benchmarks/baseline.json, exit status is 1, if regressed
+  $ python benchmarks/bench.py --save-baseline benchmarks/baseline.json  # updating the stored baseline
+  $ python benchmarks/bench.py --models 30 --no-baseline
+"""
+import os
+import sys
+import gc
+import json
+import time
+import tempfile
+import argparse
+import tracemalloc
+from collections import OrderedDict
+import django
+from django.conf import settings
+
+here = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_BASELINE = os.path.join(here, "baseline.json")
+sys.path.insert(0, os.path.dirname(here))
+
+
+def setup(db):
+    if os.path.exists(db):
+        os.remove(db)
+    settings.configure(
+        DEBUG=False,
+        DATABASES={"default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": db,
+        }},
+        INSTALLED_APPS=[__name__]
+    )
+    django.setup()
+
+
+# schema
+class Schema(object):
+    """tree of models. each child model has a foreign key to its parent (`parent`, related_name is c<i>)"""
+
+    def __init__(self, models, parents, paths):
+        self.models = models  # List[model], models[0] is root
+        self.parents = parents  # Dict[model, model]
+        self.paths = paths  # Dict[model, str], path from root (e.g. "c0__c1")
+
+    @property
+    def root(self):
+        return self.models[0]
+
+    def leaf_paths(self):
+        paths = [p for m, p in self.paths.items() if p and not any(q.startswith(p + "__") for q in self.paths.values())]
+        return sorted(paths)
+
+    def deepest(self):
+        return max(self.models, key=lambda m: (self.paths[m].count("__") if self.paths[m] else -1))
+
+
+def make_schema(n_models, fanout, depth):
+    from django.db import models
+
+    def make_model(i, parent, related_name):
+        attrs = {
+            "__module__": __name__,
+            "Meta": type("Meta", (), {"app_label": __name__, "db_table": "m{}".format(i)}),
+            "name": models.CharField(max_length=64, default="", null=False),
+            "value": models.IntegerField(default=0, null=False),
+            "memo": models.CharField(max_length=255, default="", null=False),
+        }
+        if parent is not None:
+            attrs["parent"] = models.ForeignKey(parent, related_name=related_name, null=True)
+        return type("M{}".format(i), (models.Model,), attrs)
+
+    root = make_model(0, None, None)
+    ms, parents, paths = [root], {}, {root: ""}
+    queue = [(root, 0)]
+    while queue and len(ms) < n_models:
+        parent, d = queue.pop(0)
+        if d >= depth:
+            continue
+        for j in range(fanout):
+            if len(ms) >= n_models:
+                break
+            related_name = "c{}".format(j)
+            m = make_model(len(ms), parent, related_name)
+            ms.append(m)
+            parents[m] = parent
+            paths[m] = "{}__{}".format(paths[parent], related_name) if paths[parent] else related_name
+            queue.append((m, d + 1))
+    return Schema(ms, parents, paths)
+
+
+def populate(schema, rows, per_parent):
+    from django.db import connections
+    with connections["default"].schema_editor() as schema_editor:
+        for m in schema.models:
+            schema_editor.create_model(m)
+
+    schema.root.objects.bulk_create([schema.root(name="root-{}".format(i), value=i) for i in range(rows)])
+    for m in schema.models[1:]:
+        parent_ids = list(schema.parents[m].objects.values_list("id", flat=True))
+        m.objects.bulk_create(
+            [m(name="{}-{}".format(m.__name__, i), value=i, parent_id=pk) for pk in parent_ids for i in range(per_parent)],
+            batch_size=500
+        )
+
+
+# measurement
+def count_rows(instances, paths):
+    from django_aggressivequery.execution import get_level
+    levels = {"": instances}
+    return len(instances) + sum(len(get_level(levels, p)) for p in paths)
+
+
+def measure(fn, repeat):
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+
+    times = []
+    for i in range(repeat):
+        gc.collect()
+        with CaptureQueriesContext(connections["default"]) as ctx:
+            st = time.perf_counter()
+            rows = fn()
+            times.append(time.perf_counter() - st)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return OrderedDict([
+        ("time", min(times)),
+        ("queries", len(ctx.captured_queries)),
+        ("rows", rows),
+        ("peak", peak),
+    ])
+
+
+def measure_plan(model, name_list, repeat, n=50):
+    """compiling time and retained memory per plan (extraction result and compiled plan, as plan cache holds)"""
+    from django_aggressivequery import from_queryset
+
+    def compile_plan():
+        aqs = from_queryset(model.objects.all(), name_list, cache=None)
+        return (aqs.optimizer.transaction.result, aqs.plan)
+
+    r = measure(lambda: _none(compile_plan()), repeat)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        plans = [compile_plan() for i in range(n)]
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del plans
+    r["retained"] = (after - before) // n
+    return r
+
+
+def all_prefixes(paths):
+    r = set()
+    for p in paths:
+        xs = p.split("__")
+        for i in range(1, len(xs) + 1):
+            r.add("__".join(xs[:i]))
+    return sorted(r, key=lambda p: (p.count("__"), p))
+
+
+def scenarios(schema):
+    """(name, model, name_list, baseline queryset factory, traversed paths)"""
+    from django.db.models import Prefetch
+
+    leaf_paths = schema.leaf_paths()
+    root = schema.root
+    yield ("prefetch", root, leaf_paths,
+           lambda: root.objects.prefetch_related(*[Prefetch(p) for p in all_prefixes(leaf_paths)]),
+           all_prefixes(leaf_paths))
+
+    deepest = schema.deepest()
+    n = schema.paths[deepest].count("__") + 1 if schema.paths[deepest] else 0
+    if n > 0:
+        up = "__".join(["parent"] * n)
+        yield ("join", deepest, [up],
+               lambda: deepest.objects.select_related(up),
+               all_prefixes([up]))
+
+
+def _none(ob):
+    return None
+
+
+def run(schema, repeat):
+    from django_aggressivequery import from_queryset, include_star_selection
+    from django_aggressivequery.extraction import HintExtractor, HintMap
+
+    results = OrderedDict()
+    for name, model, name_list, baseline, paths in scenarios(schema):
+        specific_list = include_star_selection(name_list)
+        phases = OrderedDict()
+        phases["extract"] = measure(lambda: _none(HintExtractor(hintmap=HintMap()).extract(model, specific_list)), repeat)
+        phases["optimize"] = measure(lambda: _none(from_queryset(model.objects.all(), name_list, cache=None).to_queryset()), repeat)
+        phases["plan"] = measure_plan(model, name_list, repeat)
+        phases["evaluate"] = measure(lambda: count_rows(list(from_queryset(model.objects.all(), name_list, cache=None)), paths), repeat)
+        phases["baseline"] = measure(lambda: count_rows(list(baseline()), paths), repeat)
+        results[name] = phases
+    return results
+
+
+# reporting
+def report(results, out=sys.stdout):
+    fmt = "{:<10} {:<10} {:>12} {:>8} {:>10} {:>12}\n"
+    out.write(fmt.format("scenario", "phase", "time(ms)", "queries", "rows", "peak(KB)"))
+    for scenario, phases in results.items():
+        for phase, r in phases.items():
+            out.write(fmt.format(scenario, phase, "{:.3f}".format(r["time"] * 1000), r["queries"],
+                                 "-" if r["rows"] is None else r["rows"], "{:.1f}".format(r["peak"] / 1024.0)))
+    out.write("\n")
+    for scenario, phases in results.items():
+        out.write("{}: memory per plan {:.1f}KB\n".format(scenario, phases["plan"]["retained"] / 1024.0))
+
+
+def compare(results, baseline, tolerance, slack=0.0, out=sys.stdout):
+    """returns regressions, comparing with stored baseline
+
+    time is regressed if it is larger than baseline * (1 + tolerance) + slack (seconds, for noise of short phases)
+    """
+    regressions = []
+    for scenario, phases in baseline.items():
+        for phase, expected in phases.items():
+            actual = results.get(scenario, {}).get(phase)
+            if actual is None:
+                continue
+            if actual["time"] > expected["time"] * (1 + tolerance) + slack:
+                regressions.append("{} {}: time {:.3f}ms > {:.3f}ms".format(scenario, phase, actual["time"] * 1000, expected["time"] * 1000))
+            if actual["queries"] > expected["queries"]:
+                regressions.append("{} {}: queries {} > {}".format(scenario, phase, actual["queries"], expected["queries"]))
+            if "retained" in expected and actual["retained"] > expected["retained"] * (1 + tolerance):
+                regressions.append("{} {}: memory per plan {} > {}".format(scenario, phase, actual["retained"], expected["retained"]))
+            if actual["rows"] != expected["rows"]:
+                regressions.append("{} {}: rows {} != {}".format(scenario, phase, actual["rows"], expected["rows"]))
+    for line in regressions:
+        out.write("regression: {}\n".format(line))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", type=int, default=15, help="number of models")
+    parser.add_argument("--fanout", type=int, default=2, help="number of child models, per model")
+    parser.add_argument("--depth", type=int, default=3, help="depth of model tree")
+    parser.add_argument("--rows", type=int, default=200, help="number of root rows")
+    parser.add_argument("--per-parent", type=int, default=2, help="number of child rows, per parent row")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "aggressivequery-bench.sqlite3"))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="comparing with stored baseline (json), default: %(default)s")
+    parser.add_argument("--no-baseline", action="store_true", help="not comparing with baseline")
+    parser.add_argument("--save-baseline", default=None, help="storing result as baseline (json)")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown ratio of time, comparing with baseline")
+    parser.add_argument("--slack", type=float, default=5.0, help="allowed slowdown of time in ms, in addition to tolerance")
+    args = parser.parse_args(argv)
+
+    setup(args.db)
+    schema = make_schema(args.models, args.fanout, args.depth)
+    populate(schema, args.rows, args.per_parent)
+    results = run(schema, args.repeat)
+    report(results)
+
+    config = OrderedDict((k, getattr(args, k)) for k in ["models", "fanout", "depth", "rows", "per_parent"])
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as wf:
+            json.dump(OrderedDict([("config", config), ("results", results)]), wf, indent=2)
+    if args.baseline and not args.no_baseline and not args.save_baseline:
+        with open(args.baseline) as rf:
+            stored = json.load(rf)
+        if stored["config"] != config:
+            sys.stderr.write("warning: config is different from baseline's, {!r} != {!r}\n".format(config, stored["config"]))
+        if compare(results, stored["results"], args.tolerance, slack=args.slack / 1000.0):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
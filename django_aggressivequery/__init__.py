@@ -2,22 +2,40 @@
 import copy
 import itertools
 import sys
+import time
 import json
 import logging
 from functools import partial
-from django.db.models.fields import related
-from django.db.models.fields import reverse_related
+from django.conf import settings
 from django.db.models import Prefetch
 from .functional import cached_property
-from .structures import Pair
+from .structures import Pair, join_name
+from .plan import CompiledPlan, PrefetchSpec, reset_select_related, reset_prefetch_related, intern_names, intern_spec  # NOQA
+from .cache import LRUCache, default_plan_cache, normalize_name_list  # NOQA
+from .warmup import warmup, WarmupReport  # NOQA
+from .registry import QueryRegistry, NamedQuery, default_registry  # NOQA
+from .serialization import dump_plans, load_plans, PlanLoadReport  # NOQA
+from .prefetch_cache import PrefetchCache  # NOQA
+from .execution import PrefetchExecutor, LevelStats  # NOQA
+from .strategies import CostBasedStrategy  # NOQA
+from .instrumentation import EvaluationReport
+from .guard import Guard, MissingNameError  # NOQA
+from . import guard
+from . import learning
+from .learning import Learner  # NOQA
+from .namelist import NameTrie, compile_name_list, find_redundant  # NOQA
+from . import signals
+from . import aio
 from . import extensions as ex
 from . import extraction
 logger = logging.getLogger(__name__)
+default_app_config = "django_aggressivequery.apps.AggressiveQueryConfig"
 
 
 class Inspector(object):
-    def __init__(self, hintmap=None):
-        self.hintmap = hintmap
+    def __init__(self, hintmap=None, strategy=None):
+        self.hintmap = hintmap or extraction.default_hintmap
+        self.strategy = strategy
 
     def depth(self, result, i=1):
         if not result.subresults:
@@ -25,55 +43,49 @@ class Inspector(object):
         else:
             return max(self.depth(r, i + 1) for r in result.subresults)
 
-    # todo: performance
-    def collect_joins(self, result):
+    def collect_joins(self, result, path=None):
         # can join: one to one*, one* to one, many to one
-        matched = {}
-        for h in result.related:
-            # custom_hint
-            if hasattr(h, "type"):
-                if type == ":join":
-                    matched[h.name] = h
-                continue
-            if isinstance(h.field.field, (related.OneToOneField)):
-                matched[h.name] = h
-        for h in result.reverse_related:
-            if isinstance(h.field.rel, (reverse_related.OneToOneRel, reverse_related.ManyToOneRel)):
-                matched[h.name] = h
-        for sr in result.subresults:
-            if sr.name in matched:
-                yield Pair(hint=matched[sr.name], result=sr)
+        return self._collect(result, ":join", path=path)
 
-    def collect_prefetch_list(self, result):
+    def collect_prefetch_list(self, result, path=None):
+        return self._collect(result, ":prefetch", path=path)
+
+    def _collect(self, result, kind, path=None):
         matched = {}
-        for h in result.related:
-            # custom_hint
-            if hasattr(h, "type"):
-                if h.type == ":prefetch":
-                    matched[h.name] = h
-                continue
-            if isinstance(h.field.field, (related.ManyToManyField, related.ForeignKey)):
-                if not isinstance(h.field.field, related.OneToOneField):
-                    matched[h.name] = h
-        for h in result.reverse_related:
-            if isinstance(h.field.rel, (reverse_related.ManyToOneRel, reverse_related.ManyToManyRel)):
-                if not isinstance(h.field.rel, reverse_related.OneToOneRel):
-                    matched[h.name] = h
+        for h in itertools.chain(result.related, result.reverse_related):
+            matched[h.name] = h
         for sr in result.subresults:
-            if sr.name in matched:
-                yield Pair(hint=matched[sr.name], result=sr)
+            h = matched.get(sr.name)
+            if h is not None and kind in self.choose(h, sr, path=path):
+                yield Pair(hint=h, result=sr)
+
+    def choose(self, hint, result, path=None):
+        """":join" or ":prefetch" (both, if many to one relation and no strategy)"""
+        if hasattr(hint, "type"):  # custom_hint
+            return (hint.type, )
+        kinds = self.hintmap.index(hint.field.model).kinds.get(hint.name, ())
+        if ":prefetch" in kinds and ":join" not in kinds:
+            return kinds
+        if not kinds:
+            return ()
+
+        # single valued relation
+        if self.strategy is None:
+            return kinds
+        name = join_name(path, hint.name)
+        decision = self.strategy.choose(name, hint, result, default=kinds[0])
+        logger.debug("@strategy: %r -> %r, %r", name, decision.kind, decision.reasons)
+        return (decision.kind, )
 
     def collect_selections(self, result):
         xs = [f.name for f in result.fields]
         ys = []
-        related_mapping = {h.name: h.rel_model for h in result.related}
+        related_names = {h.name for h in result.related}
         for sr in result.subresults:
-            if sr.name in related_mapping:
-                # this is limitation. for django's compiler.
-                sub_fields = (h.name for h in self.hintmap.iterator(related_mapping[sr.name], extraction.NOREL))
-            else:
-                sub_fields = self.collect_selections(sr)
-            ys.append(["{}__{}".format(sr.name, name) for name in sub_fields])
+            if sr.name in related_names:
+                # this is limitation. for django's compiler. (sub fields of reverse relations are not selected)
+                continue
+            ys.append(["{}__{}".format(sr.name, name) for name in self.collect_selections(sr)])
         return itertools.chain(xs, *ys)
 
     def pp(self, result, out=sys.stdout):
@@ -81,30 +93,14 @@ class Inspector(object):
         return out.write(json.dumps(d, indent=2))
 
 
-# utilities
-def reset_select_related(qs, join_targets):
-    # remove all and set new settings
-    new_qs = qs.select_related(None)
-    if join_targets:
-        new_qs = new_qs.select_related(*join_targets)
-    logger.debug("@select_related: %r - %r", qs.model.__name__, join_targets)
-    return new_qs
-
-
-def reset_prefetch_related(qs, prefetch_targets):
-    # remove all and set new settings
-    new_qs = qs.prefetch_related(None)
-    if prefetch_targets:
-        new_qs = new_qs.prefetch_related(*prefetch_targets)
-    logger.debug("@prefetch: %r - %r", qs.model.__name__, [{"through": p.prefetch_through, "query_model": p.queryset.model.__name__} for p in prefetch_targets])
-    return new_qs
-
-
 class QueryOptimizer(object):
-    def __init__(self, transaction, enable_selections=True, extensions=None):
+    skip_key = ()
+
+    def __init__(self, transaction, enable_selections=True, extensions=None, executor=None):
         self.transaction = transaction
         self.enable_selections = enable_selections
         self.extensions = extensions or ex.ExtensionRepository()
+        self.executor = executor or PrefetchExecutor()
 
     @property
     def result(self):
@@ -114,81 +110,107 @@ class QueryOptimizer(object):
     def inspector(self):
         return self.transaction.inspector
 
+    @property
+    def cache_key(self):
+        return self.make_cache_key(self.skip_key)
+
+    def make_cache_key(self, skip_key):
+        return ("plan", self.transaction.cache_key, skip_key, self.enable_selections, self.transaction.strategy)
+
     def __copy__(self):
         return self.__class__(
             transaction=copy.copy(self.transaction),
             enable_selections=self.enable_selections,
-            extensions=copy.copy(self.extensions)
+            extensions=copy.copy(self.extensions),
+            executor=self.executor
         )
 
-    def optimize(self, qs, result=None):
-        result = result or self.result
-        qs, lazy_prefetch_list = self._optimize_join(qs.all(), result)
-        qs = self._optimize_prefetch(qs, result, lazy_prefetch_list=lazy_prefetch_list)
-        qs = self._optimize_selections(qs, result)
-        return qs
+    def optimize(self, qs, result=None, key=None):
+        return self.apply(qs, self.compile(result, key=key))
 
-    def _optimize_selections(self, qs, result, name=None, externals=None):
+    def compile(self, result=None, key=None):
+        if result is None:
+            # on cache hit, extraction is not needed
+            return self._compile_with_cache(self.cache_key, lambda: self.result)
+        return self._compile_with_cache(key, lambda: result)
+
+    def _compile_with_cache(self, key, get_result):
+        cache = self.transaction.cache
+        if cache is None or key is None:
+            return self._compile(get_result())
+        return cache.get_or_create(key, lambda: self._compile(get_result()))
+
+    def apply(self, qs, plan):
+        return plan.apply(qs, extensions=self.extensions, custom_prefetchs=self.transaction.custom_prefetchs)
+
+    def _compile(self, result):
+        join_targets, lazy_prefetch_list = self._collect_join(result)
+        lazy_prefetch_list.extend(self.collect_lazy_prefetch_list_recusrive(result))
+        prefetch_list = []
+        for lazy_prefetch in lazy_prefetch_list:
+            prefetch_list.extend(self._compile_prefetch(lazy_prefetch))
+        return CompiledPlan(model=self.transaction.qs.model,
+                            select_related=intern_names(join_targets),
+                            prefetch_list=tuple(prefetch_list),
+                            only=intern_names(self._collect_selections(result)))
+
+    def _compile_prefetch(self, lazy_prefetch):
+        hint = lazy_prefetch.hint
+        if hasattr(hint, "type") and hint.type == ":prefetch":  # custom hint
+            # xxx: TODO: management lookup_name and to_attr name explicitly
+            lookup_name = lazy_prefetch.name.replace(hint.name, hint.value.prefetch_through)
+            to_attr, is_custom, externals = hint.name, True, None
+        else:
+            lookup_name = lazy_prefetch.name
+            to_attr, is_custom, externals = None, False, [hint.rel_fk] if hint.rel_fk else None
+
+        join_targets, sub_lazy_prefetch_list = self._collect_join(lazy_prefetch.result, path=lazy_prefetch.name)
+        yield intern_spec(PrefetchSpec(name=sys.intern(lazy_prefetch.name),
+                                       lookup=sys.intern(lookup_name),
+                                       model=hint.rel_model,
+                                       to_attr=to_attr,
+                                       is_custom=is_custom,
+                                       select_related=intern_names(join_targets),
+                                       only=intern_names(self._collect_selections(lazy_prefetch.result, externals=externals))))
+        # prefetching via joined objects, in prefetched queryset
+        for sub_lazy_prefetch in sub_lazy_prefetch_list:
+            for spec in self._compile_prefetch(sub_lazy_prefetch.prefixed(lazy_prefetch.name)):
+                yield spec
+
+    def _collect_selections(self, result, externals=None):
         if not self.enable_selections:
-            return qs
-        fields = list(itertools.chain(self.inspector.collect_selections(result), externals or []))
-        logger.debug("@selection, %r, %r", qs.model.__name__, fields)
-        return qs.only(*fields)
-
-    def _optimize_join(self, qs, result, name=None):
-        # todo: nested
-        lazy_join_list = list(self.collect_lazy_join_list_recursive(result, name=name))
+            return None
+        return tuple(itertools.chain(self.inspector.collect_selections(result), externals or []))
+
+    def _collect_join(self, result, path=None):
+        lazy_join_list = list(self.collect_lazy_join_list_recursive(result, path=path))
         lazy_prefetch_list = []
         join_targets = []
         for lazy_join in lazy_join_list:
             join_targets.append(lazy_join())
-            lazy_prefetch_list.extend(self.collect_lazy_prefetch_list_recusrive(lazy_join.result, name=lazy_join.name))
-        return reset_select_related(qs, join_targets), lazy_prefetch_list
-
-    def _optimize_prefetch(self, qs, result, name=None, lazy_prefetch_list=None):
-        # todo: nested, settings filter lazy
-        lazy_prefetch_list = lazy_prefetch_list or []
-        lazy_prefetch_list.extend(self.collect_lazy_prefetch_list_recusrive(result, name=name))
-        prefetch_targets = []
-        extension_list = self.extensions.with_type(":prefetch")
-        for lazy_prefetch in lazy_prefetch_list:
-            if hasattr(lazy_prefetch.hint, "type") and lazy_prefetch.hint.type == ":prefetch":  # custom hint
-                prefetch_qs, to_attr = lazy_prefetch.hint.value.queryset, lazy_prefetch.hint.name
-                for extension in extension_list:
-                    prefetch_qs = extension.apply(prefetch_qs, lazy_prefetch.name)
-                # xxx: TODO: management lookup_name and to_attr name explicitly
-                lazy_prefetch.name = lazy_prefetch.name.replace(lazy_prefetch.hint.name, lazy_prefetch.hint.value.prefetch_through)
-            else:
-                prefetch_qs, to_attr = lazy_prefetch.hint.rel_model.objects.all(), None  # default
-                for extension in extension_list:
-                    prefetch_qs = extension.apply(prefetch_qs, lazy_prefetch.name)
-
-            prefetch_qs, sub_lazy_prefch = self._optimize_join(prefetch_qs, lazy_prefetch.result, name=lazy_prefetch.name)
-            if not hasattr(lazy_prefetch.hint, "type") and lazy_prefetch.hint.rel_fk:
-                prefetch_qs = self._optimize_selections(prefetch_qs, lazy_prefetch.result, externals=[lazy_prefetch.hint.rel_fk])
-            else:
-                prefetch_qs = self._optimize_selections(prefetch_qs, lazy_prefetch.result)
-            prefetch_targets.append(lazy_prefetch(prefetch_qs, to_attr=to_attr))
-        return reset_prefetch_related(qs, prefetch_targets)
-
-    def collect_lazy_join_list_recursive(self, result, name=None):
-        pairs = self.inspector.collect_joins(result)
+            lazy_prefetch_list.extend(self.collect_lazy_prefetch_list_recusrive(
+                lazy_join.result, name=lazy_join.name, path=join_name(path, lazy_join.name)
+            ))
+        return join_targets, lazy_prefetch_list
+
+    def collect_lazy_join_list_recursive(self, result, name=None, path=None):
+        pairs = self.inspector.collect_joins(result, path=path)
         for h, sr in pairs:
             lazy_join = LazyJoin(h.name, h, sr)
             if name is not None:
                 lazy_join = lazy_join.prefixed(name)
             yield lazy_join
-            for sub_join in self.collect_lazy_join_list_recursive(sr):
+            for sub_join in self.collect_lazy_join_list_recursive(sr, path=join_name(path, h.name)):
                 yield sub_join.prefixed(lazy_join.name)
 
-    def collect_lazy_prefetch_list_recusrive(self, result, name=None):
-        pairs = self.inspector.collect_prefetch_list(result)
+    def collect_lazy_prefetch_list_recusrive(self, result, name=None, path=None):
+        pairs = self.inspector.collect_prefetch_list(result, path=path)
         for h, sr in pairs:
             lazy_prefetch = LazyPrefetch(h.name, h, sr)
             if name is not None:
                 lazy_prefetch = lazy_prefetch.prefixed(name)
             yield lazy_prefetch
-            for sub_prefetch in self.collect_lazy_prefetch_list_recusrive(sr):
+            for sub_prefetch in self.collect_lazy_prefetch_list_recusrive(sr, path=join_name(path, h.name)):
                 yield sub_prefetch.prefixed(lazy_prefetch.name)
 
     def pp(self, result=None, out=sys.stdout):
@@ -219,14 +241,23 @@ class LazyPrefetch(LazyPair):
 
 
 class AggressiveQuery(object):
-    def __init__(self, queryset, optimizer):
+    def __init__(self, queryset, optimizer, name_list=None, tracker=None):
         self.source_queryset = queryset
         self.optimizer = optimizer
+        self.name_list = name_list
+        self.tracker = tracker  # guard.AccessTracker, wrapping evaluated instances if set
+        self.prefetch_stats = None  # List[LevelStats], after evaluation
+        self.planning_time = None
+        self._result_cache = None
+        self._count = None
+        self._exists = None
 
     def __copy__(self):
         return AggressiveQuery(
             self.source_queryset.all(),
-            copy.copy(self.optimizer)
+            copy.copy(self.optimizer),
+            name_list=self.name_list,
+            tracker=self.tracker
         )
 
     def _clone(self):
@@ -237,9 +268,16 @@ class AggressiveQuery(object):
         extension = self.optimizer.extensions.with_name(k)
         return partial(extension.setup, self)
 
+    @cached_property
+    def plan(self):
+        return self.optimizer.compile()
+
     @cached_property
     def aggressive_queryset(self):
-        return self.optimizer.optimize(self.source_queryset)
+        st = time.time()
+        qs = self.optimizer.apply(self.source_queryset, self.plan)
+        self.planning_time = time.time() - st
+        return qs
 
     def to_queryset(self):
         return self.aggressive_queryset
@@ -248,36 +286,219 @@ class AggressiveQuery(object):
     def query(self):
         return self.aggressive_queryset.query
 
+    def _fetch_all(self):
+        if self._result_cache is None:
+            qs = self.aggressive_queryset
+            st = time.time()
+            instrument = signals.evaluated.has_listeners(qs.model)
+            self._set_result(qs, self.optimizer.executor.fetch(qs, instrument=instrument), instrument, st)
+        return self._result_cache
+
+    def _set_result(self, qs, fetched, instrument, st):
+        self._result_cache, root_stats, self.prefetch_stats = fetched
+        if instrument:
+            levels = [root_stats] + self.prefetch_stats
+            report = EvaluationReport(model=qs.model,
+                                      planning_time=self.planning_time,
+                                      levels=levels,
+                                      queries=sum(s.queries for s in levels),
+                                      rows=sum(s.rows for s in levels),
+                                      bytes=sum(s.bytes for s in levels),
+                                      elapsed=self.planning_time + time.time() - st)
+            signals.evaluated.send(sender=qs.model, aqs=self, report=report)
+        if self.tracker is not None:
+            self._result_cache = [guard.wrap(ob, self.tracker) for ob in self._result_cache]
+
+    async def aevaluate(self, pool=None):
+        """async evaluation. queries are run in threads of pool (concurrent.futures.Executor, loop's default if None).
+
+        sibling prefetch levels are run concurrently, on separate connections.
+        """
+        if self._result_cache is None:
+            qs = self.aggressive_queryset
+            st = time.time()
+            instrument = signals.evaluated.has_listeners(qs.model)
+            fetched = await aio.afetch(self.optimizer.executor, qs, instrument=instrument, pool=pool)
+            self._set_result(qs, fetched, instrument, st)
+        return self._result_cache
+
     def __iter__(self):
-        return iter(self.aggressive_queryset)
+        return iter(self._fetch_all())
+
+    def __len__(self):
+        # unlike QuerySet, a COUNT query if not evaluated (see count()).
+        # list(aqs) calls __iter__ before __len__, so evaluated results are used in that case
+        return self.count()
+
+    def __bool__(self):
+        # evaluating, as QuerySet (e.g. `if aqs: for ob in aqs: ...` is a single evaluation). see exists()
+        return bool(self._fetch_all())
+
+    def count(self):
+        """the number of rows, with a COUNT query on source_queryset (without joins, prefetching and only()).
+
+        if already evaluated, the length of the results. the result is cached.
+        """
+        if self._result_cache is not None:
+            return len(self._result_cache)
+        if self._count is None:
+            self._count = self.counting_queryset().count()
+        return self._count
+
+    def exists(self):
+        """the same as count(), but with an EXISTS query"""
+        if self._result_cache is not None:
+            return bool(self._result_cache)
+        if self._count is not None:
+            return self._count > 0
+        if self._exists is None:
+            self._exists = self.counting_queryset().exists()
+        return self._exists
+
+    def counting_queryset(self):
+        """source_queryset without select_related(), prefetch_related() and only()/defer(), for count() and exists()
+
+        joins by filters are kept (they can change the number of rows).
+        """
+        qs = self.source_queryset.select_related(None).prefetch_related(None)
+        qs.query.clear_deferred_loading()
+        return qs
+
+    def __aiter__(self):
+        return self._aiter()
+
+    async def _aiter(self):
+        for ob in await self.aevaluate():
+            yield ob
 
     def __getitem__(self, k):
         return self.aggressive_queryset[k]
 
+    def iterator(self, chunk_size=2000):
+        """iterating in pk ordered chunks (keyset), select_related and prefetch_related are applied per chunk.
+
+        the queryset's own ordering is ignored.
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive, got {!r}".format(chunk_size))
+        qs = self.aggressive_queryset
+        if qs.query.low_mark or qs.query.high_mark is not None:
+            raise ValueError("iterator() is not supported on sliced queryset")
+        qs = qs.order_by("pk")
+        chunk_qs = qs
+        while True:
+            chunk, _, _ = self.optimizer.executor.fetch(chunk_qs[:chunk_size])
+            for ob in chunk:
+                yield ob if self.tracker is None else guard.wrap(ob, self.tracker)
+            if len(chunk) < chunk_size:
+                break
+            chunk_qs = qs.filter(pk__gt=chunk[-1].pk)
+
+    def paginate_by_key(self, order_by, after=None, size=20):
+        """keyset pagination (seek method), -> pagination.Page (objects, cursor, has_next)
+
+        order_by is a field name (or a list of them, "-" for descending order), pk is added as the tie breaker.
+        after is the cursor of the previous page. keys must not be null.
+        """
+        from .pagination import paginate
+        return paginate(self, order_by, after=after, size=size)
+
+    def as_dicts(self):
+        """evaluating as nested dicts without model instances (values_list() queries, a query per prefetch level)
+
+        joined relations are dicts (or None), prefetched relations are lists of dicts.
+        """
+        from .values import ValuesLoader
+        objects, _ = ValuesLoader(self).load()
+        return objects
+
+    def as_tuples(self):
+        """the same as as_dicts(), but rows are tuples (fields, then joined and prefetched relations)"""
+        from .values import ValuesLoader, as_tuple
+        objects, root = ValuesLoader(self).load()
+        return [as_tuple(root, ob) for ob in objects]
+
+    def as_columns(self, use_numpy=None):
+        """evaluating as column arrays per level (name -> columnar.ColumnarLevel), without model instances
+
+        numeric columns are typed arrays (numpy arrays, if numpy is available or use_numpy is True).
+        """
+        from .columnar import ColumnarLoader
+        return ColumnarLoader(self, use_numpy=use_numpy).load()
+
+    def as_json(self, decode=True):
+        """evaluating as nested dicts with a single query, documents are built by the database (SQLite JSON1 or PostgreSQL)
+
+        the shape is the same as as_dicts(). if decode is False, JSON texts per root row.
+        """
+        from .jsonagg import JSONAggregator
+        return JSONAggregator(self).load(decode=decode)
+
+    def guard(self, raise_exception=False):
+        """detecting relations and deferred fields loaded lazily, on evaluated instances.
+
+        missing names are logged (or raised as MissingNameError) with a name_list suggestion.
+        """
+        new_aqs = self._clone()
+        new_aqs.tracker = guard.Guard(self.name_list, raise_exception=raise_exception)
+        return new_aqs
+
+    def learn(self, learner=None, key=None):
+        """recording accessed attributes on evaluated instances, to learn name_list (see learning.Learner)"""
+        learner = learner or learning.default_learner
+        new_aqs = self._clone()
+        new_aqs.tracker = learner.recorder(key or learning.call_site(depth=2), self.source_queryset.model)
+        return new_aqs
+
     def pp(self, out=sys.stdout):
         return self.optimizer.pp(out=out)
 
 
 class ExtractorTransaction(object):
-    def __init__(self, qs, name_list, extractor=None, sorted=True):
+    def __init__(self, qs, name_list, extractor=None, sorted=True, cache=None, strategy=None):
         self.qs = qs
         self.name_list = name_list
         self.extractor = extractor or extraction.HintExtractor()
+        self.cache = cache
+        self.strategy = strategy
 
     def __copy__(self):
         return self.__class__(
             self.qs._clone(),
             copy.copy(self.name_list),
-            copy.copy(self.extractor)
+            copy.copy(self.extractor),
+            cache=self.cache,
+            strategy=self.strategy
+        )
+
+    @property
+    def custom_prefetchs(self):
+        return getattr(self.extractor.hintmap, "prefetchs", None) or {}
+
+    @property
+    def cache_key(self):
+        return (
+            self.qs.model,
+            compile_name_list(self.name_list),
+            self.extractor.sorted,
+            tuple(
+                (name, p.prefetch_through, None if p.queryset is None else p.queryset.model)
+                for name, p in sorted(self.custom_prefetchs.items(), key=lambda pair: pair[0])
+            )
         )
 
     @cached_property
     def result(self):
-        return self.extractor.extract(self.qs.model, self.name_list)
+        if self.cache is None:
+            return self.extractor.extract(self.qs.model, self.name_list)
+        return self.cache.get_or_create(
+            ("result", self.cache_key, ()),
+            partial(self.extractor.extract, self.qs.model, self.name_list)
+        )
 
     @cached_property
     def inspector(self):
-        return Inspector(self.extractor.hintmap)
+        return Inspector(self.extractor.hintmap, strategy=self.strategy)
 
 
 default_hint_extractor = extraction.HintExtractor()
@@ -287,20 +508,28 @@ default_extension_repository = (
     .register(ex.PrefetchFilterExtension())
     .register(ex.SkipFieldsExtension())
     .register(ex.CustomPrefetchExtension())
+    .register(ex.PrefetchCacheExtension())
+    .register(ex.PrefetchUsingExtension())
+    .register(ex.SubqueryPrefetchExtension())
 )
 
 
-# todo: cache
 def from_queryset(qs, name_list, more_specific=False,
-                  extensions=default_extension_repository):
+                  extensions=default_extension_repository, cache=default_plan_cache,
+                  prefetch_batch_size=None, prefetch_workers=None, strategy=None):
     logger.debug("name_list: %s", name_list)
     if not isinstance(name_list, (tuple, list)):
         raise ValueError("name list is only tuple or list type. (['attr'] rather than 'attr')")
     qs = qs.all() if not hasattr(qs, "_clone") else qs
-    specific_list = name_list if more_specific else include_star_selection(name_list)
-    ex_transaction = ExtractorTransaction(qs, specific_list)
-    optimizer = QueryOptimizer(ex_transaction, enable_selections=more_specific, extensions=extensions)
-    return AggressiveQuery(qs, optimizer)
+    specific_list = compile_name_list(name_list, include_star=not more_specific)
+    ex_transaction = ExtractorTransaction(qs, specific_list, cache=cache, strategy=strategy)
+    executor = PrefetchExecutor(batch_size=prefetch_batch_size, workers=prefetch_workers)
+    optimizer = QueryOptimizer(ex_transaction, enable_selections=more_specific, extensions=extensions, executor=executor)
+    aqs = AggressiveQuery(qs, optimizer, name_list=name_list)
+    guard_mode = getattr(settings, "AGGRESSIVEQUERY_GUARD", None)  # None, "warn" or "raise"
+    if guard_mode is not None:
+        aqs = aqs.guard(raise_exception=guard_mode == "raise")
+    return aqs
 
 
 def include_star_selection(name_list):
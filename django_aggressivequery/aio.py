@@ -0,0 +1,39 @@
+# -*- coding:utf-8 -*-
+import asyncio
+import logging
+from functools import partial
+from django.db import connections
+from .execution import prefetch_dependencies, in_worker
+logger = logging.getLogger(__name__)
+
+
+async def afetch(executor, qs, instrument=False, pool=None, loop=None):
+    """async version of PrefetchExecutor.fetch()
+
+    queries are run in threads of pool (loop's default executor, if None), each thread has own connection.
+    sibling levels (e.g. orders and positions of customers) are run concurrently,
+    only dependent levels (e.g. items of orders) wait for their parent level.
+    in atomic block, queries are run in the caller's thread (uncommitted changes are not visible from other connections),
+    so the event loop is blocked until the evaluation is finished.
+    """
+    if connections[qs.db].in_atomic_block:
+        logger.debug("@afetch: in atomic block, evaluated synchronously")
+        return executor.fetch(qs, instrument=instrument)
+    loop = loop or asyncio.get_event_loop()
+    qs, prefetch_list = executor.prepare(qs)
+    instances, root_stats = await loop.run_in_executor(
+        pool, partial(in_worker, executor.fetch_root, qs, instrument=instrument)
+    )
+    levels = {"": instances}
+    stats = [None] * len(prefetch_list)
+    dependencies = prefetch_dependencies(prefetch_list)
+
+    async def run(i):
+        if i is not None:
+            stats[i] = await loop.run_in_executor(
+                pool, partial(in_worker, executor.execute_level, levels, prefetch_list[i], instrument=instrument)
+            )
+        await asyncio.gather(*[run(j) for j, parent in enumerate(dependencies) if parent == i])
+
+    await run(None)
+    return instances, root_stats, stats
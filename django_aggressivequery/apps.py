@@ -0,0 +1,31 @@
+# -*- coding:utf-8 -*-
+import os
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class AggressiveQueryConfig(AppConfig):
+    """warmup on startup, if settings.AGGRESSIVEQUERY_WARMUP is True
+
+    settings.AGGRESSIVEQUERY_WARMUP_QUERIES is passed to `warmup()` as queries.
+    settings.AGGRESSIVEQUERY_QUERIES (name -> query) is registered as named queries,
+    and the plans in settings.AGGRESSIVEQUERY_PLAN_FILE (written by `manage.py aggressivequery_plans`) are loaded.
+    """
+    name = "django_aggressivequery"
+    warmup_report = None
+    plan_report = None
+
+    def ready(self):
+        from .registry import default_registry
+        default_registry.update(getattr(settings, "AGGRESSIVEQUERY_QUERIES", None) or {})
+
+        plan_file = getattr(settings, "AGGRESSIVEQUERY_PLAN_FILE", None)
+        if plan_file and os.path.exists(plan_file):
+            from .serialization import load_plans
+            with open(plan_file) as rf:
+                self.plan_report = load_plans(rf)
+
+        if not getattr(settings, "AGGRESSIVEQUERY_WARMUP", False):
+            return
+        from .warmup import warmup
+        self.warmup_report = warmup(queries=getattr(settings, "AGGRESSIVEQUERY_WARMUP_QUERIES", None))
@@ -0,0 +1,81 @@
+# -*- coding:utf-8 -*-
+import threading
+from collections import namedtuple, OrderedDict
+
+
+_marker = object()
+CacheStats = namedtuple(
+    "CacheStats",
+    "hits, misses, evictions, size, maxsize"
+)
+
+
+class LRUCache(object):
+    """bounded LRU mapping, safe to share between threads"""
+
+    def __init__(self, maxsize=1024):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive, got {!r}".format(maxsize))
+        self.maxsize = maxsize
+        self.lock = threading.RLock()
+        self.store = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.store)
+
+    def __contains__(self, key):
+        return key in self.store
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.store.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self.store[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.store.pop(key, None)
+            self.store[key] = value
+            while len(self.store) > self.maxsize:
+                self.store.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def get_or_create(self, key, factory):
+        value = self.get(key, _marker)
+        if value is not _marker:
+            return value
+        # building outside of the lock. concurrent misses may build twice, but the first stored one wins.
+        value = factory()
+        with self.lock:
+            if key in self.store:
+                return self.store[key]
+            return self.set(key, value)
+
+    def clear(self):
+        with self.lock:
+            self.store.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self.lock:
+            return CacheStats(hits=self.hits,
+                              misses=self.misses,
+                              evictions=self.evictions,
+                              size=len(self.store),
+                              maxsize=self.maxsize)
+
+
+def normalize_name_list(name_list):
+    return tuple(sorted(set(name_list)))
+
+
+default_plan_cache = LRUCache(maxsize=1024)
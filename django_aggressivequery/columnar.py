@@ -0,0 +1,122 @@
+# -*- coding:utf-8 -*-
+import array
+import logging
+from collections import namedtuple, OrderedDict, defaultdict
+from .values import ValuesLoader, get_query_name
+try:
+    import numpy
+except ImportError:  # optional
+    numpy = None
+logger = logging.getLogger(__name__)
+
+
+ColumnarLevel = namedtuple(
+    "ColumnarLevel",
+    "name, model, size, columns, offsets"
+)
+
+
+def children_of(self, i, name):
+    """values of column of i-th parent's children (self is a child level)"""
+    return self.columns[name][self.offsets[i]:self.offsets[i + 1]]
+
+
+ColumnarLevel.children_of = children_of
+
+
+class ColumnarLoader(ValuesLoader):
+    """evaluating Result tree as column arrays per level (like Arrow's list layout)
+
+    each level (root, and each prefetched path) has columns (name -> array) and offsets.
+    children of i-th row of parent level are rows offsets[i]:offsets[i + 1] of the child level.
+    joined relations are flattened into their level (e.g. "karma__point"), None if not joined.
+    """
+
+    def __init__(self, aqs, use_numpy=None):
+        super().__init__(aqs)
+        self.use_numpy = (numpy is not None) if use_numpy is None else use_numpy
+        if self.use_numpy and numpy is None:
+            raise ValueError("numpy is not installed")
+
+    def load(self):
+        qs = self.aqs.source_queryset
+        columns = []
+        root = self.collect(qs.model, self.aqs.optimizer.result, "", "", columns)
+        rows = list(qs.prefetch_related(None).values_list(*columns))
+        levels = OrderedDict()
+        levels[""] = self.make_level("", root, rows, None)
+        queue = [(root, rows)]
+        while queue:
+            level_root, rows = queue.pop(0)
+            for node in iter_nodes(level_root):
+                for hint, result, path in node.prefetchs:
+                    child, child_rows, offsets = self.load_prefetch(node, hint, result, path, rows)
+                    levels[path] = self.make_level(path, child, child_rows, offsets)
+                    queue.append((child, child_rows))
+        return levels
+
+    def load_prefetch(self, node, hint, result, path, parent_rows):
+        query_name = get_query_name(hint)
+        qs = self.prefetch_queryset(hint, path)
+        columns = [query_name]
+        child = self.collect(hint.rel_model, result, path, "", columns)
+
+        keys = {row[node.pk] for row in parent_rows}
+        keys.discard(None)
+        groups = defaultdict(list)
+        for row in qs.filter(**{query_name + "__in": list(keys)}).values_list(*columns):
+            groups[row[0]].append(row)
+
+        rows, offsets = [], [0]
+        for row in parent_rows:
+            k = row[node.pk]
+            if k is not None:
+                rows.extend(groups.get(k, ()))
+            offsets.append(len(rows))
+        logger.debug("@columnar: %r, parents=%r, rows=%r", path, len(parent_rows), len(rows))
+        return child, rows, offsets
+
+    def make_level(self, name, node, rows, offsets):
+        columns = OrderedDict()
+        for column, i in iter_columns(node):
+            columns[column] = self.to_array([row[i] for row in rows])
+        if offsets is not None:
+            offsets = numpy.array(offsets, dtype="int64") if self.use_numpy else array.array("q", offsets)
+        return ColumnarLevel(name=name, model=node.model, size=len(rows), columns=columns, offsets=offsets)
+
+    def to_array(self, values):
+        """int and float columns are typed arrays, others are lists (or object arrays of numpy)"""
+        typecode = guess_typecode(values)
+        if self.use_numpy:
+            return numpy.array(values, dtype={"q": "int64", "d": "float64"}.get(typecode, object))
+        if typecode is None:
+            return values
+        return array.array(typecode, values)
+
+
+def guess_typecode(values):
+    typecode = "q"
+    for v in values:
+        if isinstance(v, bool) or v is None:
+            return None
+        if isinstance(v, float):
+            typecode = "d"
+        elif not isinstance(v, int):
+            return None
+    return typecode
+
+
+def iter_nodes(node):
+    """node and its joined nodes (rows of the same level)"""
+    yield node
+    for _, sub in node.joins:
+        for x in iter_nodes(sub):
+            yield x
+
+
+def iter_columns(node, prefix=""):
+    for name, i in node.names:
+        yield prefix + name, i
+    for name, sub in node.joins:
+        for x in iter_columns(sub, prefix=prefix + name + "__"):
+            yield x
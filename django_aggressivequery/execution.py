@@ -0,0 +1,233 @@
+# -*- coding:utf-8 -*-
+import time
+import threading
+import contextlib
+import logging
+from collections import namedtuple
+from concurrent import futures
+import django
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Manager, Prefetch
+from .instrumentation import QueryCounter, estimate_loaded_bytes
+from . import subquery
+logger = logging.getLogger(__name__)
+
+
+LevelStats = namedtuple(
+    "LevelStats",
+    "name, model, batches, rows, elapsed, queries, bytes"
+)
+
+
+class PrefetchExecutor(object):
+    """evaluating queryset, and running its prefetch lookups level by level
+
+    if batch_size is set, each level is splitted into several queries, each query has at most batch_size parents.
+    if workers is set, sibling levels are run in parallel on a shared thread pool (each thread has own connection).
+    levels on subquery_paths are filtered by subqueries derived from the root queryset (see subquery.SubqueryPrefetch).
+    """
+
+    def __init__(self, batch_size=None, workers=None, subquery_paths=()):
+        if batch_size is not None and batch_size <= 0:
+            raise ValueError("batch_size must be positive, got {!r}".format(batch_size))
+        if workers is not None and workers <= 0:
+            raise ValueError("workers must be positive, got {!r}".format(workers))
+        self.batch_size = batch_size
+        self.workers = workers
+        self.subquery_paths = frozenset(subquery_paths)
+        self.lock = threading.RLock()  # levels are shared, if levels are executed concurrently (see aio.afetch())
+
+    def fetch(self, qs, instrument=False):
+        """returns (instances, LevelStats of root, list of LevelStats of prefetch levels)
+
+        if instrument is True, queries and bytes of LevelStats are counted, otherwise None.
+        """
+        qs, prefetch_list = self.prepare(qs)
+        instances, root_stats = self.fetch_root(qs, instrument=instrument)
+        return instances, root_stats, self.execute(instances, prefetch_list, instrument=instrument)
+
+    def prepare(self, qs):
+        """-> (root queryset without prefetch lookups, prefetch lookups)"""
+        prefetch_list = [as_prefetch(lookup) for lookup in qs._prefetch_related_lookups]
+        qs = qs.prefetch_related(None)
+        # subquery of sliced queryset (LIMIT in IN clause) is not supported by some databases
+        if self.subquery_paths and not (qs.query.low_mark or qs.query.high_mark is not None):
+            prefetch_list = subquery.make_subquery_prefetchs(qs, prefetch_list, prefetch_dependencies(prefetch_list), self.subquery_paths)
+        return qs, prefetch_list
+
+    def fetch_root(self, qs, instrument=False):
+        st = time.time()
+        with _counting(instrument, qs.db) as counter:
+            instances = list(qs)
+        root_stats = LevelStats(name="", model=qs.model, batches=1, rows=len(instances),
+                                elapsed=time.time() - st,
+                                queries=counter and counter.count,
+                                bytes=counter and estimate_loaded_bytes(instances))
+        return instances, root_stats
+
+    def execute(self, instances, prefetch_list, instrument=False):
+        if self.workers is not None and len(prefetch_list) > 1 and instances:
+            using = instances[0]._state.db
+            if not connections[using].in_atomic_block:
+                return self.execute_parallel(instances, prefetch_list, instrument=instrument)
+            # uncommitted changes are not visible from other connections
+            logger.debug("@execute: in atomic block, levels are run sequentially")
+        levels = {"": instances}
+        stats = []
+        for lookup in prefetch_list:
+            stats.append(self.execute_level(levels, as_prefetch(lookup), instrument=instrument))
+        return stats
+
+    def execute_parallel(self, instances, prefetch_list, instrument=False):
+        prefetch_list = [as_prefetch(lookup) for lookup in prefetch_list]
+        levels = {"": instances}
+        stats = [None] * len(prefetch_list)
+        dependencies = prefetch_dependencies(prefetch_list)
+        pool = get_pool(self.workers)
+
+        def submit(i):
+            return {
+                pool.submit(in_worker, self.execute_level, levels, prefetch_list[j], instrument=instrument): j
+                for j, parent in enumerate(dependencies) if parent == i
+            }
+
+        running = submit(None)
+        try:
+            while running:
+                done, _ = futures.wait(running, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    i = running.pop(future)
+                    stats[i] = future.result()
+                    running.update(submit(i))
+        except Exception:
+            for future in running:
+                future.cancel()
+            raise
+        return stats
+
+    def execute_level(self, levels, lookup, instrument=False):
+        parent_path, _, name = lookup.prefetch_to.rpartition("__")
+        through_name = lookup.prefetch_through.rpartition("__")[2]
+        with self.lock:
+            parents = get_level(levels, parent_path)
+            for ob in parents:
+                # sibling levels share parents. (prefetch_related_objects() creates it without lock)
+                if not hasattr(ob, "_prefetched_objects_cache"):
+                    ob._prefetched_objects_cache = {}
+        batch_size = self.batch_size or len(parents) or 1
+
+        st = time.time()
+        batches = 0
+        # the level's own database if routed (e.g. prefetch_using()), otherwise the parents' one
+        using = lookup.queryset._db if lookup.queryset is not None else None
+        if using is None and parents:
+            using = parents[0]._state.db
+        with _counting(instrument, using) as counter:
+            if isinstance(lookup, subquery.SubqueryPrefetch):
+                if parents:  # the subquery is not splitted
+                    subquery.assign(parents, lookup)
+                    batches += 1
+            else:
+                for i in range(0, len(parents), batch_size):
+                    prefetch = Prefetch(through_name, queryset=lookup.queryset, to_attr=lookup.to_attr)
+                    prefetch_related_objects(parents[i:i + batch_size], prefetch)
+                    batches += 1
+        children = traverse(parents, name)
+        with self.lock:
+            levels[lookup.prefetch_to] = children
+        elapsed = time.time() - st
+
+        model = lookup.queryset.model if lookup.queryset is not None else None
+        logger.debug("@execute: %r, batches=%r, rows=%r, elapsed=%.4f", lookup.prefetch_to, batches, len(children), elapsed)
+        return LevelStats(name=lookup.prefetch_to, model=model, batches=batches, rows=len(children), elapsed=elapsed,
+                          queries=counter and counter.count,
+                          bytes=counter and estimate_loaded_bytes(children))
+
+
+@contextlib.contextmanager
+def _counting(instrument, using):
+    if not instrument:
+        yield None
+    else:
+        with QueryCounter(using or DEFAULT_DB_ALIAS) as counter:
+            yield counter
+
+
+def as_prefetch(lookup):
+    return lookup if isinstance(lookup, Prefetch) else Prefetch(lookup)
+
+
+def prefetch_dependencies(prefetch_list):
+    """index of the lookup which each lookup depends on (None, if it depends on root only)
+
+    e.g. ["orders", "orders__items", "karma"] -> [None, 0, None]
+    lookups depending on the same lookup (siblings) are independent of each other.
+    """
+    r = []
+    for i, lookup in enumerate(prefetch_list):
+        parent = None
+        for j in range(i):
+            path = prefetch_list[j].prefetch_to
+            if lookup.prefetch_to.startswith(path + "__"):
+                if parent is None or len(path) > len(prefetch_list[parent].prefetch_to):
+                    parent = j
+        r.append(parent)
+    return r
+
+
+_pools = {}  # Dict[workers, ThreadPoolExecutor]
+_pools_lock = threading.Lock()
+
+
+def get_pool(workers):
+    """thread pool shared by executors having the same number of workers"""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = futures.ThreadPoolExecutor(max_workers=workers)
+        return pool
+
+
+def in_worker(fn, *args, **kwargs):
+    """calling fn in a worker thread. the thread's own connections are closed if obsolete (CONN_MAX_AGE)"""
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        for conn in connections.all():
+            conn.close_if_unusable_or_obsolete()
+
+
+def get_level(levels, path):
+    """instances on path. e.g. 'customer__orders' -> orders of customers"""
+    if path not in levels:
+        parent_path, _, name = path.rpartition("__")
+        levels[path] = traverse(get_level(levels, parent_path), name)
+    return levels[path]
+
+
+def traverse(instances, name):
+    result = []
+    for ob in instances:
+        try:
+            v = getattr(ob, name)
+        except ObjectDoesNotExist:
+            continue
+        if v is None:
+            continue
+        if isinstance(v, Manager):
+            result.extend(v.all())
+        elif isinstance(v, list):
+            result.extend(v)
+        else:
+            result.append(v)
+    return result
+
+
+if django.VERSION >= (1, 10):
+    from django.db.models import prefetch_related_objects
+else:
+    from django.db.models.query import prefetch_related_objects as _prefetch_related_objects
+
+    def prefetch_related_objects(model_instances, *related_lookups):
+        return _prefetch_related_objects(model_instances, related_lookups)
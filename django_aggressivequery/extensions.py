@@ -1,9 +1,12 @@
 # -*- coding:utf-8 -*-
 import copy
 import functools
+import itertools
 from collections import defaultdict
 from .functional import cached_property
-from .structures import excluded_result, dict_from_keys, CustomHint
+from .structures import excluded_result, CustomHint
+from .namelist import compile_name_list
+from .prefetch_cache import with_prefetch_cache
 
 # extension type
 extension_types = [":prefetch", ":selecting", ":join", ":wrap"]
@@ -16,7 +19,11 @@ class ExtensionRepository(object):
         self.name_map = name_map or {}
 
     def __copy__(self):
-        return self.__class__(type_map=copy.copy(self.type_map), name_map=copy.copy(self.name_map))
+        # extensions hold per query state (e.g. filters), so sharing them between copies is leaking
+        new = self.__class__()
+        for extension in self.name_map.values():
+            new.register(copy.copy(extension))
+        return new
 
     def register(self, extension, override=False):
         if not override and extension.name in self.name_map:
@@ -76,6 +83,12 @@ class SkipFieldsExtension(WrappingExtension):
         return new_aqs
 
 
+def _unwrap_optimizer(optimizer):
+    while isinstance(optimizer, _FilteredQueryOptimizer):
+        optimizer = optimizer._optimizer
+    return optimizer
+
+
 class _FilteredQueryOptimizer(object):
     """decorator object for QueryOptimizer"""
     def __init__(self, optimizer, skips):
@@ -88,12 +101,31 @@ class _FilteredQueryOptimizer(object):
     def __copy__(self):
         return self.__class__(copy.copy(self._optimizer), self.skips)
 
-    def optimize(self, qs, result=None):
-        return self._optimizer.optimize(qs, result or self.result)
+    @property
+    def skip_key(self):
+        return self._optimizer.skip_key + tuple(sorted(self.skips))
+
+    @property
+    def cache_key(self):
+        return self._optimizer.make_cache_key(self.skip_key)
+
+    def optimize(self, qs, result=None, key=None):
+        return self._optimizer.apply(qs, self.compile(result, key=key))
+
+    def compile(self, result=None, key=None):
+        if result is None:
+            return self._optimizer._compile_with_cache(self.cache_key, lambda: self.result)
+        return self._optimizer.compile(result, key=key)
 
     @cached_property
     def result(self):
-        return excluded_result(self._optimizer.result, dict_from_keys(self.skips))
+        cache = self.transaction.cache
+        if cache is None:
+            return self._make_result()
+        return cache.get_or_create(("result", self.transaction.cache_key, self.skip_key), self._make_result)
+
+    def _make_result(self):
+        return excluded_result(self._optimizer.result, compile_name_list(self.skips))
 
 
 class PrefetchFilterExtension(OnPrefetchExtension):
@@ -104,7 +136,10 @@ class PrefetchFilterExtension(OnPrefetchExtension):
         self.filters = filters or defaultdict(list)
 
     def __copy__(self):
-        return self.__class__(filters=copy.copy(self.filters))
+        filters = defaultdict(list)
+        for name, filter_list in self.filters.items():
+            filters[name] = list(filter_list)
+        return self.__class__(filters=filters)
 
     def setup(self, aqs, **conditions):
         new_aqs = aqs._clone()
@@ -118,6 +153,84 @@ class PrefetchFilterExtension(OnPrefetchExtension):
         return functools.reduce(lambda qs, f: f(qs), filters, prefetch_qs)
 
 
+class PrefetchCacheExtension(OnPrefetchExtension):
+    """caching prefetched rows between requests (see prefetch_cache.PrefetchCache)"""
+    name = "prefetch_cache"
+
+    def __init__(self, caches=None):
+        self.caches = caches or {}
+
+    def __copy__(self):
+        return self.__class__(caches=copy.copy(self.caches))
+
+    def setup(self, aqs, **caches):
+        new_aqs = aqs._clone()
+        new_extension = self.get_self_from_aqs(new_aqs)
+        new_extension.caches.update(caches)
+        return new_aqs
+
+    def apply(self, prefetch_qs, name):
+        prefetch_cache = self.caches.get(name)
+        if prefetch_cache is None:
+            return prefetch_qs
+        return with_prefetch_cache(prefetch_qs, prefetch_cache)
+
+
+class PrefetchUsingExtension(OnPrefetchExtension):
+    """routing prefetch levels to databases (e.g. read replicas)
+
+    `prefetch_using("replica")` routes all prefetch levels, `prefetch_using(orders__items="replica")` routes a path.
+    if several aliases are passed (e.g. `["replica1", "replica2"]`), queries are spread over them (round robin).
+    """
+    name = "prefetch_using"
+
+    def __init__(self, default=None, aliases=None):
+        self.default = default  # itertools.cycle of aliases, for all paths
+        self.aliases = aliases or {}  # Dict[path, itertools.cycle]
+
+    def __copy__(self):
+        return self.__class__(default=self.default, aliases=copy.copy(self.aliases))
+
+    def setup(self, aqs, *aliases, **paths):
+        new_aqs = aqs._clone()
+        new_extension = self.get_self_from_aqs(new_aqs)
+        if aliases:
+            new_extension.default = _cycle(aliases)
+        for name, alias in paths.items():
+            new_extension.aliases[name] = _cycle(alias if isinstance(alias, (list, tuple)) else [alias])
+        return new_aqs
+
+    def apply(self, prefetch_qs, name):
+        aliases = self.aliases.get(name, self.default)
+        if aliases is None:
+            return prefetch_qs
+        return prefetch_qs.using(next(aliases))
+
+
+def _cycle(aliases):
+    if not aliases:
+        raise ValueError("aliases are required")
+    return itertools.cycle(list(aliases))
+
+
+class SubqueryPrefetchExtension(WrappingExtension):
+    """prefetching the paths with subqueries derived from the root queryset, instead of lists of parents' ids"""
+    name = "prefetch_subquery"
+
+    def setup(self, aqs, *paths):
+        if not paths:
+            raise ValueError("paths are required. (e.g. prefetch_subquery('orders__items'))")
+        new_aqs = aqs._clone()
+        optimizer = _unwrap_optimizer(new_aqs.optimizer)  # kept by copy.copy() of wrappers (e.g. after skip_filter())
+        executor = optimizer.executor
+        optimizer.executor = executor.__class__(
+            batch_size=executor.batch_size,
+            workers=executor.workers,
+            subquery_paths=executor.subquery_paths.union(paths)
+        )
+        return new_aqs
+
+
 class CustomPrefetchExtension(WrappingExtension):
     """like a Prefetch(<name>, <queryset>, to_attr=<attrname>)"""
     name = "custom_prefetch"
@@ -1,6 +1,9 @@
 import django
-from collections import defaultdict, OrderedDict
-from .structures import Hint, TmpResult, Result
+from collections import Counter, OrderedDict
+from django.db.models.fields import related
+from django.db.models.fields import reverse_related
+from .structures import Hint, TmpResult, ModelIndex, make_result
+from .namelist import compile_name_list, merge_tries
 import logging
 logger = logging.getLogger(__name__)
 
@@ -49,6 +52,7 @@ class HintMap(object):
 
     def __init__(self):
         self.cache = {}  # Dict[model, Hint]
+        self.indexes = {}  # Dict[model, ModelIndex]
 
     def extract(self, model):
         d = OrderedDict()
@@ -90,117 +94,209 @@ class HintMap(object):
     def iterator(self, model, tokens, history=None):
         return self.iterator_cls(self.load(model), tokens)
 
+    def index(self, model):
+        """classification of model's hints, computed once per model"""
+        index = self.indexes.get(model)
+        if index is None:
+            index = self.indexes[model] = self.make_index(model)
+        return index
+
+    def make_index(self, model):
+        kinds = {}
+        for hint in self.load(model).values():
+            if hint.is_relation and hint.name not in kinds:
+                kinds[hint.name] = classify_relation(hint)
+        return ModelIndex(kinds=kinds)
+
+
+def classify_relation(hint):
+    """":join" or ":prefetch" (both, if many to one relation)"""
+    if not hint.is_reverse_related:
+        if isinstance(hint.field.field, related.OneToOneField):
+            return (":join", )
+        elif isinstance(hint.field.field, (related.ManyToManyField, related.ForeignKey)):
+            return (":prefetch", )
+        else:
+            return ()
+    else:
+        if isinstance(hint.field.rel, reverse_related.OneToOneRel):
+            return (":join", )
+        elif isinstance(hint.field.rel, reverse_related.ManyToOneRel):
+            return (":join", ":prefetch")
+        elif isinstance(hint.field.rel, reverse_related.ManyToManyRel):
+            return (":prefetch", )
+        else:
+            return ()
+
+
+# shared by all extractors. model's metadata is not changed after django.setup()
+default_hintmap = HintMap()
+
 
 class HintExtractor(object):
     ALL = "*"
 
-    def __init__(self, sorted=True, hintmap=None):
+    def __init__(self, sorted=True, hintmap=None, interner=None):
         self.sorted = sorted
         self.bidirectional = False
-        self.hintmap = hintmap or HintMap()
+        self.hintmap = hintmap or default_hintmap
+        self.interner = interner  # structures.ResultInterner, default_result_interner if None
 
     def __copy__(self):
-        return self.__class__(sorted=self.sorted, hintmap=self.hintmap)
+        return self.__class__(sorted=self.sorted, hintmap=self.hintmap, interner=self.interner)
 
     def extract(self, model, name_list):
         backref = set()
         backref.add((model, ""))
         history = [""]
-        tmp_result = self.drilldown(model, name_list, backref=backref, history=history)
+        tmp_result = self.drilldown(model, compile_name_list(name_list), backref=backref, history=history)
         return self.classify(tmp_result)
 
     def seq(self, seq, key):
         return sorted(seq, key=key) if self.sorted else seq
 
-    def classify(self, tmp_result):
-        result = Result(name=tmp_result.name,
-                        fields=[],
-                        related=[],
-                        reverse_related=[],
-                        subresults=[])
-        for h in self.seq(tmp_result.hints.values(), key=lambda h: h.name):
-            if not h.is_relation:
-                result.fields.append(h)
+    def classify(self, tmp_result, memo=None):
+        """TmpResult -> Result. shared subtrees (see drilldown()) are classified once"""
+        memo = {} if memo is None else memo
+        stack = [(tmp_result, False)]
+        while stack:
+            tr, visited = stack.pop()
+            if id(tr) in memo:
+                continue
+            subresults = self.seq(tr.subresults.values(), key=lambda r: r.name)
+            if not visited:
+                stack.append((tr, True))
+                stack.extend((sr, False) for sr in reversed(subresults))
                 continue
 
-            if h.is_reverse_related:
-                result.reverse_related.append(h)
-            else:
-                result.related.append(h)
+            fields, related, reverse_related = [], [], []
+            for h in self.seq(tr.hints.values(), key=lambda h: h.name):
+                if not h.is_relation:
+                    fields.append(h)
+                    continue
 
-        for sr in self.seq(tmp_result.subresults.values(), key=lambda r: r.name):
-            result.subresults.append(self.classify(sr))
-        return result
+                if h.is_reverse_related:
+                    reverse_related.append(h)
+                else:
+                    related.append(h)
+            memo[id(tr)] = make_result(name=tr.name,
+                                       fields=fields,
+                                       related=related,
+                                       reverse_related=reverse_related,
+                                       subresults=[memo[id(sr)] for sr in subresults],
+                                       interner=self.interner)
+        return memo[id(tmp_result)]
 
     def drilldown(self, model, name_list, backref, history, indent=0):
-        parent_name = history[-1]
-        logger.info("%s name=%r model=%r %r", " " * (indent + indent), parent_name, model.__name__, name_list)
-        hints = OrderedDict()
-        names = set()
-        rels = defaultdict(list)
-        for name in name_list:
+        """iterative (worklist) drilldown.
+
+        name_list is a list of names or a compiled namelist.NameTrie.
+        subresults are memoized by (model, sub trie, name, indent == 1) and the backref entries checked in it,
+        so identical subtrees are extracted once and shared.
+        """
+        trie = compile_name_list(name_list)
+        memo = {}  # Dict[key, List[(checked, relevant, TmpResult)]]
+        tries = {}  # Dict[id, NameTrie], holding sub tries in keys of memo
+        backref = Counter(backref)  # edges on current path
+        # custom hints (e.g. custom_prefetch()) are found by full name, so the subtrees are not shared
+        path_dependent = bool(getattr(self.hintmap, "prefetchs", None))
+        root = self._visit(model, trie, history, indent, backref)
+        stack = [root]
+        while stack:
+            frame = stack[-1]
+            if frame.i < len(frame.children):
+                hint, sub_trie = frame.children[frame.i]
+                frame.i += 1
+                edge = (frame.model, hint.name)
+                backref[edge] += 1
+                tries[id(sub_trie)] = sub_trie
+                key = (hint.rel_model, id(sub_trie), hint.name, frame.indent + 1 == 1)
+                if path_dependent:
+                    key = (key, tuple(frame.history))
+                for checked, relevant, tmp_result in memo.get(key, ()):
+                    if all((backref[k] > 0) == (k in relevant) for k in checked):
+                        frame.add(tmp_result, checked - {edge})
+                        backref[edge] -= 1
+                        break
+                else:
+                    child = self._visit(hint.rel_model, sub_trie, frame.history + [hint.name], frame.indent + 1, backref)
+                    child.edge, child.key = edge, key
+                    stack.append(child)
+                continue
+
+            stack.pop()
+            tmp_result = TmpResult(name=frame.history[-1], hints=frame.hints, subresults=frame.subresults)
+            if not stack:
+                return tmp_result
+            checked = frozenset(frame.checked)
+            relevant = frozenset(k for k in checked if backref[k] > 0)
+            memo.setdefault(frame.key, []).append((checked, relevant, tmp_result))
+            backref[frame.edge] -= 1
+            stack[-1].add(tmp_result, checked - {frame.edge})
+
+    def _visit(self, model, trie, history, indent, backref):
+        logger.info("%s name=%r model=%r %r", " " * (indent + indent), history[-1], model.__name__, trie)
+        frame = _Frame(model, history, indent)
+        rels = trie.children
+        prefixes = {prefix for prefix, _ in rels}
+        names = []
+        for name in trie.names:
             if name == self.ALL:
-                names.add(NOREL)
-            elif "__" not in name:
-                if name not in rels:
-                    names.add(name)
-            else:
-                prefix, sub_name = name.split("__", 1)
-                rels[prefix].append(sub_name)
+                names.append(NOREL)
+            elif name not in prefixes:  # e.g. "user" is drilled down with "user__name"
+                names.append(name)
 
         iterator = self.hintmap.iterator(model, names, history=history)
         for hint, _ in iterator:
-            hints[hint.name] = hint
+            frame.hints[hint.name] = hint
 
-        subresults_dict = OrderedDict()
-        # hints is dict? REL and explicit relation name.
-        for prefix, sub_name_list in rels.items():
+        # sub name lists of the same relation (e.g. "*" and explicit name) are drilled down at once
+        children = OrderedDict()
+        for prefix, sub_trie in rels:
             if prefix == self.ALL:
                 prefix = REL
             for hint, selected in iterator.clone([prefix]):
                 if not hint.is_relation:
-                    hints[hint.name] = hint
+                    frame.hints[hint.name] = hint
                     continue
 
                 logger.debug("\t\t\tfield %r %r (%r %r)", model.__name__, hint.name, hint.rel_model.__name__, hint.rel_name)
-                k = (model, hint.name)
                 if not selected:
-                    if indent == 1 and (hint.rel_model, "") in backref:
-                        logger.info("\t\t\tskip %r %r %r", model.__name__, hint.name, hint.rel_model.__name__)
-                        continue
-                    if (hint.rel_model, hint.rel_name) in backref:
+                    if indent == 1:
+                        frame.checked.add((hint.rel_model, ""))
+                        if backref[(hint.rel_model, "")] > 0:
+                            logger.info("\t\t\tskip %r %r %r", model.__name__, hint.name, hint.rel_model.__name__)
+                            continue
+                    frame.checked.add((hint.rel_model, hint.rel_name))
+                    if backref[(hint.rel_model, hint.rel_name)] > 0:
                         logger.info("\t\t\tskip %s %s %s", model.__name__, hint.name, hint.rel_model.__name__)
                         continue
-                backref.add(k)
-                hints[hint.name] = hint
-                history.append(hint.name)
-                self._merge(
-                    subresults_dict,
-                    self.drilldown(
-                        hint.rel_model, sub_name_list,
-                        backref=backref, history=history, indent=indent + 1
-                    )
-                )
-                history.pop()
-                if k in backref:
-                    backref.remove(k)
-        return TmpResult(name=parent_name, hints=hints, subresults=subresults_dict)
-
-    def _merge(self, result_dict, tr):
-        if tr.name not in result_dict:
-            result_dict[tr.name] = tr
-        else:
-            cr = result_dict[tr.name]
-            merge_tmp_result(cr, tr)
-
-
-def merge_tmp_result(tr0, tr1):
-    tr0.hints.update(tr1.hints)
-    for name in tr1.subresults.keys():
-        if name not in tr0.subresults:
-            tr0.subresults[name] = tr1.subresults[name]
-        else:
-            merge_tmp_result(tr0.subresults[name], tr1.subresults[name])
+                frame.hints[hint.name] = hint
+                if hint.name in children:
+                    sub_trie = merge_tries(children[hint.name][1], sub_trie)
+                children[hint.name] = (hint, sub_trie)
+        frame.children = list(children.values())
+        return frame
+
+
+class _Frame(object):
+    __slots__ = ("model", "history", "indent", "hints", "subresults", "children", "i", "checked", "edge", "key")
+
+    def __init__(self, model, history, indent):
+        self.model = model
+        self.history = history  # names from root
+        self.indent = indent
+        self.hints = OrderedDict()
+        self.subresults = OrderedDict()
+        self.children = []  # List[(hint, NameTrie)]
+        self.i = 0
+        self.checked = set()  # backref entries, which this subtree depends on
+        self.edge = None
+        self.key = None
+
+    def add(self, tmp_result, checked):
+        self.subresults[tmp_result.name] = tmp_result
+        self.checked.update(checked)
 
 
 if django.VERSION >= (1, 8):
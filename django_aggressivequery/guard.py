@@ -0,0 +1,201 @@
+# -*- coding:utf-8 -*-
+import logging
+from django.db.models import Model
+logger = logging.getLogger(__name__)
+
+FIELD = "field"
+RELATION = "relation"
+
+
+class MissingNameError(Exception):
+    def __init__(self, name, suggestion):
+        super().__init__("{!r} is not in name_list (suggestion: {!r})".format(name, suggestion))
+        self.name = name
+        self.suggestion = suggestion
+
+
+class AccessTracker(object):
+    """receiving attribute accesses on guarded instances
+
+    on_access() is called with full name (e.g. "customer__orders"), kind ("field" or "relation"),
+    and missing (True if the access is going to load from database).
+    """
+
+    def on_access(self, name, kind, missing):
+        pass
+
+
+class Guard(AccessTracker):
+    """detecting lazy loading (N+1 queries) after evaluation"""
+
+    def __init__(self, name_list=None, raise_exception=False):
+        self.name_list = list(name_list or [])
+        self.raise_exception = raise_exception
+        self.missing = []
+
+    def on_access(self, name, kind, missing):
+        if not missing or name in self.missing:
+            return
+        self.missing.append(name)
+        if self.raise_exception:
+            raise MissingNameError(name, self.suggestion())
+        logger.warning("@guard: %s %r is loaded lazily, suggestion: %r", kind, name, self.suggestion())
+
+    def suggestion(self):
+        return self.name_list + [name for name in sorted(self.missing) if name not in self.name_list]
+
+
+def wrap(ob, tracker, path=None):
+    if isinstance(ob, Model):
+        return GuardedInstance(ob, tracker, path)
+    return ob
+
+
+def unwrap(ob):
+    if isinstance(ob, GuardedInstance):
+        return object.__getattribute__(ob, "_wrapped")
+    return ob
+
+
+def _join_name(prefix, name):
+    return "{}__{}".format(prefix, name) if prefix else name
+
+
+def _is_cached(field, instance):
+    if hasattr(field, "is_cached"):  # django >= 2.0
+        return field.is_cached(instance)
+    return field.get_cache_name() in instance.__dict__
+
+
+_attributes_cache = {}  # Dict[model, Dict[name, field]]
+
+
+def get_attributes(model):
+    """attribute name -> field (or reverse relation)"""
+    if model not in _attributes_cache:
+        d = {}
+        for f in model._meta.get_fields():
+            if f.auto_created and not f.concrete:
+                d[f.get_accessor_name()] = f
+            else:
+                d[f.name] = f
+                if getattr(f, "attname", f.name) != f.name:
+                    d[f.attname] = f
+        _attributes_cache[model] = d
+    return _attributes_cache[model]
+
+
+class GuardedInstance(object):
+    """proxy of model instance, notifying accesses to tracker.
+
+    isinstance() works as usual (via __class__).
+    """
+
+    def __init__(self, wrapped, tracker, path=None):
+        object.__setattr__(self, "_wrapped", wrapped)
+        object.__setattr__(self, "_tracker", tracker)
+        object.__setattr__(self, "_path", path)
+
+    @property
+    def __class__(self):
+        return self._wrapped.__class__
+
+    def __getattr__(self, k):
+        ob = self._wrapped
+        field = get_attributes(ob.__class__).get(k)
+        if field is None:
+            value = getattr(ob, k)
+            if isinstance(value, list) and value and isinstance(value[0], Model):  # custom prefetch (to_attr)
+                name = _join_name(self._path, k)
+                self._tracker.on_access(name, RELATION, False)
+                return [wrap(x, self._tracker, name) for x in value]
+            return value
+
+        is_attname = k != field.name and k == getattr(field, "attname", None)  # e.g. customer_id
+        name = _join_name(self._path, field.name if is_attname else k)
+        if not field.is_relation:
+            self._tracker.on_access(name, FIELD, field.attname in ob.get_deferred_fields())
+            return getattr(ob, k)
+        elif is_attname:
+            if field.attname in ob.get_deferred_fields():
+                self._tracker.on_access(name, RELATION, True)
+            return getattr(ob, k)
+        elif field.many_to_many or field.one_to_many:
+            manager = getattr(ob, k)
+            self._tracker.on_access(name, RELATION, manager.get_queryset()._result_cache is None)
+            return GuardedManager(manager, self._tracker, name)
+        elif field.concrete:  # forward one to one, many to one
+            missing = not _is_cached(field, ob) and (
+                field.attname in ob.get_deferred_fields() or getattr(ob, field.attname) is not None
+            )
+            self._tracker.on_access(name, RELATION, missing)
+            return wrap(getattr(ob, k), self._tracker, name)
+        else:  # reverse one to one
+            self._tracker.on_access(name, RELATION, not _is_cached(field, ob))
+            return wrap(getattr(ob, k), self._tracker, name)
+
+    def __setattr__(self, k, v):
+        setattr(self._wrapped, k, v)
+
+    def __delattr__(self, k):
+        delattr(self._wrapped, k)
+
+    def __eq__(self, other):
+        return self._wrapped == unwrap(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self._wrapped)
+
+    def __repr__(self):
+        return repr(self._wrapped)
+
+    def __str__(self):
+        return str(self._wrapped)
+
+
+class GuardedManager(object):
+    def __init__(self, manager, tracker, path):
+        self._manager = manager
+        self._tracker = tracker
+        self._path = path
+
+    def __getattr__(self, k):
+        return getattr(self._manager, k)
+
+    def all(self):
+        return GuardedQuerySet(self._manager.all(), self._tracker, self._path)
+
+    def __repr__(self):
+        return repr(self._manager)
+
+
+class GuardedQuerySet(object):
+    def __init__(self, qs, tracker, path):
+        self._qs = qs
+        self._tracker = tracker
+        self._path = path
+
+    def __getattr__(self, k):
+        return getattr(self._qs, k)
+
+    def __iter__(self):
+        for ob in self._qs:
+            yield wrap(ob, self._tracker, self._path)
+
+    def __len__(self):
+        return len(self._qs)
+
+    def __bool__(self):
+        return bool(self._qs)
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [wrap(ob, self._tracker, self._path) for ob in self._qs[k]]
+        return wrap(self._qs[k], self._tracker, self._path)
+
+    def __repr__(self):
+        return repr(self._qs)
+
@@ -0,0 +1,83 @@
+# -*- coding:utf-8 -*-
+from collections import namedtuple
+from django.db import connections
+from .strategies import estimate_row_width
+
+
+EvaluationReport = namedtuple(
+    "EvaluationReport",
+    "model, planning_time, levels, queries, rows, bytes, elapsed"
+)
+
+
+class QueryCounter(object):
+    """counting executed queries on a connection, with `connection.execute_wrapper()` if available"""
+
+    def __init__(self, using):
+        self.connection = connections[using]
+        self.count = 0
+        self._wrapper_context = None
+        self._cursor = None
+
+    def __enter__(self):
+        if hasattr(self.connection, "execute_wrapper"):  # django >= 2.0
+            self._wrapper_context = self.connection.execute_wrapper(self)
+            self._wrapper_context.__enter__()
+        else:
+            # wrapping cursors (queries_log is bounded, its length is not reliable)
+            self._cursor = self.connection.__dict__.get("cursor")
+            cursor = self.connection.cursor
+
+            def counting_cursor(*args, **kwargs):
+                return _CountingCursor(cursor(*args, **kwargs), self)
+            self.connection.cursor = counting_cursor
+        return self
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __exit__(self, typ, val, tb):
+        if self._wrapper_context is not None:
+            return self._wrapper_context.__exit__(typ, val, tb)
+        if self._cursor is None:
+            del self.connection.cursor
+        else:
+            self.connection.cursor = self._cursor
+
+
+class _CountingCursor(object):
+    def __init__(self, cursor, counter):
+        self.cursor = cursor
+        self.counter = counter
+
+    def execute(self, *args, **kwargs):
+        self.counter.count += 1
+        return self.cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self.counter.count += 1
+        return self.cursor.executemany(*args, **kwargs)
+
+    def __getattr__(self, k):
+        return getattr(self.cursor, k)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __enter__(self):
+        self.cursor.__enter__()
+        return self
+
+    def __exit__(self, typ, val, tb):
+        return self.cursor.__exit__(typ, val, tb)
+
+
+def estimate_loaded_bytes(instances):
+    """rough size of loaded (not deferred) columns"""
+    if not instances:
+        return 0
+    ob = instances[0]
+    deferred = ob.get_deferred_fields()
+    fields = [f for f in ob._meta.concrete_fields if f.attname not in deferred]
+    return len(instances) * estimate_row_width(fields)
@@ -0,0 +1,145 @@
+# -*- coding:utf-8 -*-
+import json
+import logging
+import itertools
+from django.db import connections
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+from .structures import join_name
+from .values import ValuesLoader, get_query_name, is_many
+logger = logging.getLogger(__name__)
+
+# annotation of the root queryset, a JSON document per row
+DOCUMENT = "_aggressivequery_document"
+
+# formats of SQL functions, per vendor
+DIALECTS = {
+    "sqlite": {
+        "object": "json_object({})",
+        "array": "json_group_array({})",
+        "nested": "json({})",  # results of subqueries are text, in SQLite
+        "document": "{}",
+    },
+    "postgresql": {
+        "object": "json_build_object({})",
+        "array": "coalesce(json_agg({}), '[]'::json)",
+        "nested": "{}",
+        "document": "({})::text",
+    },
+}
+
+
+class _Node(object):
+    """an object in the document. children are single valued (or many valued) relations"""
+    __slots__ = ("model", "fields", "children")
+
+    def __init__(self, model):
+        self.model = model
+        self.fields = []  # List[field]
+        self.children = []  # List[(name, _Node, many, queryset, key lookup, parent's key field)]
+
+    def key_fields(self):
+        """fields of self, referred by children's subqueries"""
+        return [child[5] for child in self.children]
+
+
+class JSONAggregator(ValuesLoader):
+    """evaluating Result tree with a single query, nested objects are built with JSON functions of the database
+
+    joined and prefetched relations are correlated subqueries (json_object()/json_group_array() on SQLite JSON1,
+    json_build_object()/json_agg() on PostgreSQL), fields are fields of Result.
+    """
+
+    def __init__(self, aqs):
+        super().__init__(aqs)
+        qs = aqs.source_queryset
+        self.connection = connections[qs.db]
+        self.dialect = DIALECTS.get(self.connection.vendor)
+        if self.dialect is None:
+            raise ValueError("json aggregation is not supported on {!r}".format(self.connection.vendor))
+        self.counter = itertools.count(1)
+
+    def to_queryset(self):
+        """root queryset, annotated with a JSON document per row"""
+        qs = self.aqs.source_queryset
+        root = self.collect(qs.model, self.aqs.optimizer.result, "")
+        table = self.connection.ops.quote_name(qs.model._meta.db_table)
+
+        def column(field):
+            return "{}.{}".format(table, self.connection.ops.quote_name(field.column))
+
+        sql, params = self.render(root, column)
+        sql = self.dialect["document"].format(sql)
+        logger.debug("@jsonagg: %s", sql)
+        return qs.prefetch_related(None).annotate(**{DOCUMENT: RawSQL(sql, params)})
+
+    def load(self, decode=True):
+        documents = self.to_queryset().values_list(DOCUMENT, flat=True)
+        if not decode:
+            return list(documents)
+        return [json.loads(doc) for doc in documents]
+
+    def collect(self, model, result, path):
+        node = _Node(model)
+        node.fields.extend(h.field for h in result.fields)
+        joined = set()
+        for hint, sr in self.inspector.collect_joins(result, path=path):
+            joined.add(hint.name)
+            qs = hint.rel_model._default_manager.all()
+            if self.aqs.source_queryset._db is not None:
+                qs = qs.using(self.aqs.source_queryset._db)
+            self.add_child(node, hint, sr, join_name(path, hint.name), qs)
+        for hint, sr in self.inspector.collect_prefetch_list(result, path=path):
+            if hint.name in joined:  # many to one relation, prefetching joined objects is no-op
+                continue
+            name = join_name(path, hint.name)
+            if hasattr(hint, "type"):  # custom hint
+                raise ValueError("{}: custom_prefetch is not supported with json aggregation".format(name))
+            self.add_child(node, hint, sr, name, self.prefetch_queryset(hint, name))
+        return node
+
+    def add_child(self, node, hint, result, path, qs):
+        field = hint.field
+        if hint.is_reverse_related and not field.many_to_many:  # forward foreign key (and one to one)
+            key, parent_key = field.target_field.name, field
+        elif hint.is_reverse_related:  # forward many to many
+            key, parent_key = get_query_name(hint), node.model._meta.pk
+        else:  # reverse relations
+            key = get_query_name(hint)
+            parent_key = node.model._meta.pk if field.many_to_many else field.field.target_field
+        child = self.collect(hint.rel_model, result, path)
+        node.children.append((hint.name, child, is_many(hint), qs, key, parent_key))
+
+    def render(self, node, column):
+        """-> (sql, params), json object of node. column(field) is SQL expression of node's column"""
+        items, params = [], []
+        for field in node.fields:
+            items.append("'{}', {}".format(field.name, column(field)))
+        for name, child, many, qs, key, parent_key in node.children:
+            sql, child_params = self.render_child(child, many, qs, key, column(parent_key))
+            items.append("'{}', {}".format(name, sql))
+            params.extend(child_params)
+        return self.dialect["object"].format(", ".join(items)), params
+
+    def render_child(self, child, many, qs, key, parent_column):
+        alias = "_aq_t{}".format(next(self.counter))
+        qn = self.connection.ops.quote_name
+
+        fields = []
+        for field in itertools.chain(child.fields, child.key_fields()):
+            if field not in fields:
+                fields.append(field)
+        annotations = {"_aq_c{}".format(i): F(field.name) for i, field in enumerate(fields)}
+        annotations["_aq_key"] = F(key)
+        names = ["_aq_c{}".format(i) for i in range(len(fields))]
+        subqs = qs.annotate(**annotations).values_list("_aq_key", *names)
+        sub_sql, sub_params = subqs.query.get_compiler(connection=self.connection).as_sql()
+
+        def column(field):
+            return "{}.{}".format(alias, qn(names[fields.index(field)]))
+
+        sql, params = self.render(child, column)
+        if many:
+            sql = self.dialect["array"].format(sql)
+        sql = "(SELECT {} FROM ({}) {} WHERE {}.{} = {})".format(sql, sub_sql, alias, alias, qn("_aq_key"), parent_column)
+        return self.dialect["nested"].format(sql), params + list(sub_params)
@@ -0,0 +1,102 @@
+# -*- coding:utf-8 -*-
+import sys
+import threading
+import logging
+from collections import defaultdict
+from .guard import AccessTracker, RELATION, get_attributes
+logger = logging.getLogger(__name__)
+
+
+class AccessRecorder(AccessTracker):
+    def __init__(self, learner, key, model):
+        self.learner = learner
+        self.key = key
+        self.model = model
+
+    def on_access(self, name, kind, missing):
+        self.learner.record(self.key, self.model, name, kind)
+
+
+class Learner(object):
+    """learning name_list from accessed attributes, per call site
+
+    suggestion() returns the minimal name_list for `more_specific=True`.
+    if auto_apply is True, learned name_list is used by from_queryset(), after min_samples calls.
+    """
+
+    def __init__(self, auto_apply=False, min_samples=1):
+        self.auto_apply = auto_apply
+        self.min_samples = min_samples
+        self.observed = defaultdict(dict)  # Dict[key, Dict[name, kind]]
+        self.models = {}  # Dict[key, model]
+        self.samples = defaultdict(int)  # Dict[key, int]
+        self._lock = threading.Lock()
+
+    def recorder(self, key, model):
+        with self._lock:
+            self.models[key] = model
+            self.samples[key] += 1
+        return AccessRecorder(self, key, model)
+
+    def record(self, key, model, name, kind):
+        observed = self.observed[key]
+        if name not in observed:
+            with self._lock:
+                observed[name] = kind
+
+    def suggestion(self, key):
+        """minimal name_list, or None if nothing is observed"""
+        observed = self.observed.get(key)
+        if not observed:
+            return None
+        names = sorted(observed.keys())
+        name_list = []
+        for name in names:
+            # "customer" is implied by "customer__name"
+            if any(other.startswith(name + "__") for other in names):
+                continue
+            if observed[name] == RELATION:
+                related_model = _get_related_model(self.models[key], name)
+                if related_model is not None:
+                    # a relation is loaded only if one of its fields is selected
+                    name = "{}__{}".format(name, related_model._meta.pk.name)
+            name_list.append(name)
+        return name_list
+
+    def report(self):
+        return {key: self.suggestion(key) for key in list(self.observed.keys())}
+
+    def from_queryset(self, qs, name_list, key=None, **kwargs):
+        """from_queryset() with learning. key is caller's "<filename>:<lineno>", by default"""
+        from . import from_queryset
+        key = key or call_site(depth=2)
+        if self.auto_apply and self.samples[key] >= self.min_samples:
+            suggestion = self.suggestion(key)
+            if suggestion is not None:
+                logger.debug("@learning: %s, applying %r", key, suggestion)
+                kwargs["more_specific"] = True
+                return from_queryset(qs, suggestion, **kwargs).learn(self, key=key)
+        return from_queryset(qs, name_list, **kwargs).learn(self, key=key)
+
+    def clear(self):
+        with self._lock:
+            self.observed.clear()
+            self.models.clear()
+            self.samples.clear()
+
+
+def _get_related_model(model, name):
+    for k in name.split("__"):
+        field = get_attributes(model).get(k)
+        if field is None:  # e.g. custom prefetch (to_attr)
+            return None
+        model = field.related_model
+    return model
+
+
+def call_site(depth=1):
+    frame = sys._getframe(depth)
+    return "{}:{}".format(frame.f_code.co_filename, frame.f_lineno)
+
+
+default_learner = Learner()
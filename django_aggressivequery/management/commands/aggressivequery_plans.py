@@ -0,0 +1,34 @@
+# -*- coding:utf-8 -*-
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django_aggressivequery.registry import default_registry
+from django_aggressivequery.serialization import dump_plans, load_plans
+
+
+class Command(BaseCommand):
+    help = "compiling plans of named queries (settings.AGGRESSIVEQUERY_QUERIES), for loading them on startup"
+
+    def add_arguments(self, parser):
+        parser.add_argument("-o", "--output", default=None,
+                            help="plan file (settings.AGGRESSIVEQUERY_PLAN_FILE, by default)")
+        parser.add_argument("--check", action="store_true", default=False,
+                            help="validating existing plan file, instead of writing")
+
+    def handle(self, *args, **options):
+        path = options["output"] or getattr(settings, "AGGRESSIVEQUERY_PLAN_FILE", None)
+        if not path:
+            raise CommandError("plan file is not specified (--output or settings.AGGRESSIVEQUERY_PLAN_FILE)")
+        if options["check"]:
+            with open(path) as rf:
+                report = load_plans(rf, cache=None)
+            for name, reason in report.rejected:
+                self.stderr.write("stale: {} ({})".format(name, reason))
+            if report.rejected:
+                raise CommandError("{} plans are stale, in {}".format(len(report.rejected), path))
+            self.stdout.write("ok: {} plans, in {}".format(len(report.loaded), path))
+            return
+
+        queries = list(default_registry)
+        with open(path, "w") as wf:
+            dump_plans(queries, wf)
+        self.stdout.write("write: {} plans, to {}".format(len(queries), path))
@@ -0,0 +1,164 @@
+# -*- coding:utf-8 -*-
+import sys
+import logging
+from collections import namedtuple
+from .cache import LRUCache
+logger = logging.getLogger(__name__)
+
+ALL = "*"
+SEPARATOR = "__"
+
+NameTrie = namedtuple(
+    "NameTrie",
+    "names, children"  # names: Tuple[str], children: Tuple[Tuple[str, NameTrie]]
+)
+
+
+def child_of(self, name):
+    for prefix, trie in self.children:
+        if prefix == name:
+            return trie
+    return EMPTY
+
+
+def iter_names(self, prefix=""):
+    """NameTrie -> name_list"""
+    for name in self.names:
+        yield prefix + name
+    for k, trie in self.children:
+        for name in iter_names(trie, prefix=prefix + k + SEPARATOR):
+            yield name
+
+
+def repr_trie(self):
+    return "NameTrie({!r})".format(list(iter_names(self)))
+
+
+NameTrie.child = child_of
+NameTrie.iter_names = iter_names
+NameTrie.__repr__ = repr_trie
+
+
+class NameListCompiler(object):
+    """name_list -> NameTrie (immutable, interned. equal tries are identical objects)
+
+    tokens are interned and sorted, so tries don't depend on the order of name_list.
+    compiled tries are cached by name_list.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.compiled = LRUCache(maxsize=maxsize)
+        self.tries = LRUCache(maxsize=maxsize * 4)
+        self.merged = LRUCache(maxsize=maxsize)
+
+    def compile(self, name_list, include_star=False):
+        """if include_star is True, "*" is added on each level (the same as `include_star_selection()`)"""
+        if isinstance(name_list, NameTrie):
+            return name_list
+        key = (tuple(name_list), include_star)
+        return self.compiled.get_or_create(key, lambda: self._compile(name_list, include_star))
+
+    def _compile(self, name_list, include_star):
+        root = _Node()
+        for name in name_list:
+            node = root
+            tokens = [sys.intern(t) for t in name.split(SEPARATOR)]
+            for t in tokens[:-1]:
+                node = node.child(t)
+            if include_star:
+                node.child(tokens[-1])
+            else:
+                node.names.add(tokens[-1])
+        if include_star:
+            root.add_star_recursively()
+        redundants = find_redundant(name_list)
+        if redundants:
+            logger.info("@compile: redundant names are found, %r", redundants)
+        return self._freeze(root)
+
+    def _freeze(self, root):
+        stack = [(root, False)]
+        frozen = {}  # Dict[id, NameTrie]
+        while stack:
+            node, visited = stack.pop()
+            if not visited:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children.values())
+                continue
+            children = [(k, frozen[id(child)]) for k, child in node.children.items()]
+            frozen[id(node)] = self.make(node.names, children)
+        return frozen[id(root)]
+
+    def make(self, names, children):
+        names = tuple(sorted(names))
+        children = tuple(sorted(children, key=lambda pair: pair[0]))
+        # sub tries are interned already, so comparing them by identity
+        # (ids are stable, because the stored trie holds them)
+        key = (names, tuple((k, id(trie)) for k, trie in children))
+        return self.tries.get_or_create(key, lambda: NameTrie(names=names, children=children))
+
+    def merge(self, x, y):
+        """union of two tries"""
+        if x is y or y is EMPTY:
+            return x
+        if x is EMPTY:
+            return y
+        # x and y are held by the stored value, so their ids are stable
+        return self.merged.get_or_create((id(x), id(y)), lambda: (x, y, self._merge(x, y)))[2]
+
+    def _merge(self, x, y):
+        children = dict(x.children)
+        for k, trie in y.children:
+            children[k] = self.merge(children[k], trie) if k in children else trie
+        return self.make(set(x.names).union(y.names), children.items())
+
+
+class _Node(object):
+    __slots__ = ("names", "children")
+
+    def __init__(self):
+        self.names = set()
+        self.children = {}
+
+    def child(self, name):
+        node = self.children.get(name)
+        if node is None:
+            node = self.children[name] = _Node()
+        return node
+
+    def add_star_recursively(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            node.names.add(ALL)
+            stack.extend(node.children.values())
+
+
+def find_redundant(name_list):
+    """names having no effect. (duplicated, or covered by a longer name, e.g. "user" and "user__name")"""
+    r = []
+    seen = set()
+    prefixes = set()
+    for name in name_list:
+        tokens = name.split(SEPARATOR)
+        for i in range(1, len(tokens)):
+            prefixes.add(SEPARATOR.join(tokens[:i]))
+    for name in name_list:
+        if name in seen:
+            r.append((name, "duplicated"))
+        elif name in prefixes:
+            r.append((name, "covered by longer name"))
+        seen.add(name)
+    return r
+
+
+default_compiler = NameListCompiler()
+EMPTY = default_compiler.make((), ())
+
+
+def compile_name_list(name_list, include_star=False):
+    return default_compiler.compile(name_list, include_star=include_star)
+
+
+def merge_tries(x, y):
+    return default_compiler.merge(x, y)
@@ -0,0 +1,100 @@
+# -*- coding:utf-8 -*-
+import json
+import base64
+import logging
+from collections import namedtuple
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+logger = logging.getLogger(__name__)
+
+
+Page = namedtuple(
+    "Page",
+    "objects, cursor, has_next"
+)
+Key = namedtuple(
+    "Key",
+    "name, descending"
+)
+
+
+def paginate(aqs, order_by, after=None, size=20):
+    """keyset pagination (seek method). the plan is applied to the page's queryset, so prefetching is per page"""
+    if size <= 0:
+        raise ValueError("size must be positive, got {!r}".format(size))
+    qs = aqs.aggressive_queryset
+    if qs.query.low_mark or qs.query.high_mark is not None:
+        raise ValueError("paginate_by_key() is not supported on sliced queryset")
+    keys = normalize_order_by(qs.model, order_by)
+    loading, deferred = qs.query.deferred_loading
+    if loading and not deferred:  # only(), keys are needed for the cursor
+        qs = qs.only(*set(loading).union(k.name for k in keys if k.name != "pk"))
+    if after is not None:
+        qs = qs.filter(seek_condition(keys, decode_cursor(after, keys)))
+    qs = qs.order_by(*[("-" if k.descending else "") + k.name for k in keys])
+
+    # the extra row is only for has_next, prefetching is run on the page's rows
+    executor = aqs.optimizer.executor
+    qs, prefetch_list = executor.prepare(qs[:size + 1])
+    objects, _ = executor.fetch_root(qs)
+    has_next = len(objects) > size
+    objects = objects[:size]
+    executor.execute(objects, prefetch_list)
+    cursor = encode_cursor(keys, [get_value(objects[-1], k.name) for k in keys]) if has_next else None
+    logger.debug("@paginate: after=%r, size=%r, has_next=%r", after, size, has_next)
+    if aqs.tracker is not None:
+        from .guard import wrap
+        objects = [wrap(ob, aqs.tracker) for ob in objects]
+    return Page(objects=objects, cursor=cursor, has_next=has_next)
+
+
+def normalize_order_by(model, order_by):
+    """-> List[Key], pk is added as the last key (tie breaker), if not included"""
+    if isinstance(order_by, str):
+        order_by = [order_by]
+    keys = []
+    for name in order_by:
+        descending = name.startswith("-")
+        name = name.lstrip("-")
+        if name == model._meta.pk.name:
+            name = "pk"
+        keys.append(Key(name=name, descending=descending))
+    if not keys:
+        raise ValueError("order_by is empty")
+    if "pk" not in [k.name for k in keys]:
+        keys.append(Key(name="pk", descending=keys[-1].descending))
+    return keys
+
+
+def seek_condition(keys, values):
+    """rows after values, in order of keys. e.g. (a > x) or (a = x and b > y)"""
+    condition = Q()
+    for i, k in enumerate(keys):
+        q = Q(**{"{}__{}".format(k.name, "lt" if k.descending else "gt"): values[i]})
+        for prev, v in zip(keys[:i], values):
+            q &= Q(**{prev.name: v})
+        condition |= q
+    return condition
+
+
+def get_value(ob, name):
+    for attr in name.split("__"):
+        ob = getattr(ob, attr)
+    return ob
+
+
+def encode_cursor(keys, values):
+    payload = {"k": [("-" if k.descending else "") + k.name for k in keys], "v": values}
+    data = json.dumps(payload, cls=DjangoJSONEncoder, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii")
+
+
+def decode_cursor(cursor, keys):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+        names, values = payload["k"], payload["v"]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise ValueError("invalid cursor: {!r}".format(cursor))
+    if names != [("-" if k.descending else "") + k.name for k in keys] or len(values) != len(keys):
+        raise ValueError("cursor doesn't match order_by: {!r}".format(names))
+    return values
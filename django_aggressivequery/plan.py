@@ -0,0 +1,103 @@
+# -*- coding:utf-8 -*-
+import sys
+import logging
+from collections import namedtuple
+from django.db.models import Prefetch
+from .cache import LRUCache
+logger = logging.getLogger(__name__)
+
+
+CompiledPlan = namedtuple(
+    "CompiledPlan",
+    "model, select_related, prefetch_list, only"
+)
+PrefetchSpec = namedtuple(
+    "PrefetchSpec",
+    "name, lookup, model, to_attr, is_custom, select_related, only"
+)
+
+
+# utilities
+def intern_names(names):
+    """names of plans are repeated between plans, so sharing them (or None)"""
+    if names is None:
+        return None
+    return tuple(sys.intern(name) for name in names)
+
+
+_specs = LRUCache(maxsize=8192)
+
+
+def intern_spec(spec):
+    """equal specs are shared between plans (flyweight)"""
+    return _specs.get_or_create(spec, lambda: spec)
+
+
+def reset_select_related(qs, join_targets):
+    # remove all and set new settings
+    new_qs = qs.select_related(None)
+    if join_targets:
+        new_qs = new_qs.select_related(*join_targets)
+    logger.debug("@select_related: %r - %r", qs.model.__name__, join_targets)
+    return new_qs
+
+
+def reset_prefetch_related(qs, prefetch_targets):
+    # remove all and set new settings
+    new_qs = qs.prefetch_related(None)
+    if prefetch_targets:
+        new_qs = new_qs.prefetch_related(*prefetch_targets)
+    logger.debug("@prefetch: %r - %r", qs.model.__name__, [{"through": p.prefetch_through, "query_model": p.queryset.model.__name__} for p in prefetch_targets])
+    return new_qs
+
+
+def apply_plan(self, qs, extensions=None, custom_prefetchs=None):
+    """building optimized queryset from plan. qs is not modified"""
+    if qs.model._meta.concrete_model is not self.model._meta.concrete_model:
+        raise ValueError("plan is compiled for {}, but queryset's model is {}".format(self.model.__name__, qs.model.__name__))
+    qs = reset_select_related(qs.all(), self.select_related)
+    # prefetch levels follow the alias of queryset, if it is specified by using()
+    prefetch_list = [spec.to_prefetch(extensions, custom_prefetchs, using=qs._db) for spec in self.prefetch_list]
+    qs = reset_prefetch_related(qs, prefetch_list)
+    if self.only is not None:
+        logger.debug("@selection, %r, %r", qs.model.__name__, self.only)
+        qs = qs.only(*self.only)
+    return qs
+
+
+def asdict_plan(self):
+    d = self._asdict()
+    d["model"] = self.model.__name__
+    d["prefetch_list"] = [spec.asdict() for spec in self.prefetch_list]
+    return d
+
+
+def prefetch_from_spec(self, extensions=None, custom_prefetchs=None, using=None):
+    prefetch_qs = None
+    if self.is_custom:
+        if not custom_prefetchs or self.name not in custom_prefetchs:
+            raise ValueError("{!r} is custom prefetch, custom_prefetchs[{!r}] is required".format(self.name, self.name))
+        prefetch_qs = custom_prefetchs[self.name].queryset
+    if prefetch_qs is None:
+        prefetch_qs = self.model.objects.all()  # default
+    if using is not None and prefetch_qs._db is None:
+        prefetch_qs = prefetch_qs.using(using)
+    if extensions is not None:
+        for extension in extensions.with_type(":prefetch"):
+            prefetch_qs = extension.apply(prefetch_qs, self.name)
+    prefetch_qs = reset_select_related(prefetch_qs, self.select_related)
+    if self.only is not None:
+        prefetch_qs = prefetch_qs.only(*self.only)
+    return Prefetch(self.lookup, queryset=prefetch_qs, to_attr=self.to_attr)
+
+
+def asdict_spec(self):
+    d = self._asdict()
+    d["model"] = self.model.__name__
+    return d
+
+
+CompiledPlan.apply = apply_plan
+CompiledPlan.asdict = asdict_plan
+PrefetchSpec.to_prefetch = prefetch_from_spec
+PrefetchSpec.asdict = asdict_spec
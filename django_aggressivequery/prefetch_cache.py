@@ -0,0 +1,204 @@
+# -*- coding:utf-8 -*-
+import time
+import pickle
+import hashlib
+import logging
+import threading
+import weakref
+from django.apps import apps
+from django.db.models import signals
+from .cache import LRUCache
+try:
+    from django.core.exceptions import EmptyResultSet
+except ImportError:  # django < 1.11
+    from django.db.models.sql.datastructures import EmptyResultSet
+logger = logging.getLogger(__name__)
+
+_marker = object()
+
+
+class LocalStorage(object):
+    """in-process storage (bounded LRU). invalidation is visible in this process only"""
+
+    def __init__(self, maxsize=1024):
+        self.cache = LRUCache(maxsize=maxsize)
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        entry = self.cache.get(key)
+        if entry is None or entry[0] < time.time():
+            return None
+        return entry[1]
+
+    def set(self, key, value, ttl):
+        self.cache.set(key, (time.time() + ttl, value))
+
+    def get_versions(self, labels):
+        return [self.versions.get(label, 0) for label in labels]
+
+    def incr_version(self, label):
+        with self.lock:
+            self.versions[label] = self.versions.get(label, 0) + 1
+
+    def clear(self):
+        self.cache.clear()
+
+
+class DjangoCacheStorage(object):
+    """storage on django's cache backend (e.g. memcached, shared between processes)"""
+    prefix = "aggressivequery:prefetch:"
+
+    def __init__(self, cache):
+        if isinstance(cache, str):
+            from django.core.cache import caches
+            cache = caches[cache]
+        self.cache = cache
+
+    def get(self, key):
+        return self.cache.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.cache.set(self.prefix + key, value, timeout=ttl)
+
+    def get_versions(self, labels):
+        keys = [self.prefix + "version:" + label for label in labels]
+        found = self.cache.get_many(keys)
+        return [found.get(k, 0) for k in keys]
+
+    def incr_version(self, label):
+        key = self.prefix + "version:" + label
+        self.cache.add(key, 0, timeout=None)
+        try:
+            self.cache.incr(key)
+        except ValueError:  # evicted, after add()
+            self.cache.set(key, 1, timeout=None)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class PrefetchCache(object):
+    """caching prefetched rows between requests, used with `aqs.prefetch_cache(<name>=PrefetchCache(...))`
+
+    rows are cached per prefetch query (the set of parent ids), for ttl seconds.
+    cached rows are invalidated by post_save, post_delete and m2m_changed of the models in the query.
+    backend is None (in-process LRU), an alias of settings.CACHES, or a cache object.
+
+    only models which cached queries of this process depend on are watched (labels).
+    with a shared backend, pass models, for processes writing them without evaluating the cached queries.
+    """
+
+    def __init__(self, backend=None, ttl=300, maxsize=1024, models=()):
+        if ttl <= 0:
+            raise ValueError("ttl must be positive, got {!r}".format(ttl))
+        self.ttl = ttl
+        self.labels = {model_label(model) for model in models}  # watched models
+        self.storage = LocalStorage(maxsize=maxsize) if backend is None else DjangoCacheStorage(backend)
+        self.hits = 0
+        self.misses = 0
+        _caches.add(self)
+        connect_signals()
+
+    def get_or_fetch(self, qs, fetch):
+        labels = sorted(get_models_of_query(qs))
+        self.labels.update(labels)
+        versions = self.storage.get_versions(labels)
+        try:
+            sql, params = qs.query.get_compiler(using=qs.db).as_sql()
+        except EmptyResultSet:  # e.g. qs.none(), no query is needed
+            return fetch()
+        key = hashlib.sha1(repr((qs.db, sql, params, labels, versions)).encode("utf-8")).hexdigest()
+        value = self.storage.get(key)
+        if value is not None:
+            self.hits += 1
+            return pickle.loads(value)
+        self.misses += 1
+        result = fetch()
+        # pickled before prefetching children (prefetching sets caches on the instances)
+        self.storage.set(key, pickle.dumps(result, pickle.HIGHEST_PROTOCOL), self.ttl)
+        return result
+
+    def invalidate(self, model):
+        self.storage.incr_version(model_label(model))
+
+    def clear(self):
+        self.storage.clear()
+        self.hits = self.misses = 0
+
+
+def model_label(model):
+    return model._meta.label
+
+
+def get_models_of_query(qs):
+    """labels of models which the query depends on (tables in FROM and JOIN clauses)"""
+    tables = get_table_map()
+    labels = {model_label(qs.model)}
+    for alias in qs.query.alias_map.values():
+        model = tables.get(alias.table_name)
+        if model is not None:
+            labels.add(model_label(model))
+    return labels
+
+
+_tables = None
+
+
+def get_table_map():
+    global _tables
+    if _tables is None:
+        _tables = {m._meta.db_table: m for m in apps.get_models(include_auto_created=True)}
+    return _tables
+
+
+class CachedQuerySetMixin(object):
+    prefetch_cache = None
+
+    def _clone(self, *args, **kwargs):
+        clone = super()._clone(*args, **kwargs)
+        clone.prefetch_cache = self.prefetch_cache
+        return clone
+
+    def _fetch_all(self):
+        if self._result_cache is None and self.prefetch_cache is not None:
+            self._result_cache = self.prefetch_cache.get_or_fetch(self, lambda: list(self.iterator()))
+        return super()._fetch_all()
+
+
+_classes = {}
+
+
+def with_prefetch_cache(qs, prefetch_cache):
+    """queryset evaluated with prefetch_cache"""
+    cls = _classes.get(qs.__class__)
+    if cls is None:
+        if issubclass(qs.__class__, CachedQuerySetMixin):
+            cls = qs.__class__
+        else:
+            cls = _classes[qs.__class__] = type("Cached{}".format(qs.__class__.__name__), (CachedQuerySetMixin, qs.__class__), {})
+    new_qs = qs._clone()
+    new_qs.__class__ = cls
+    new_qs.prefetch_cache = prefetch_cache
+    return new_qs
+
+
+# invalidation
+_caches = weakref.WeakSet()
+_connected = False
+
+
+def on_changed(sender, **kwargs):
+    label = model_label(sender)
+    for prefetch_cache in list(_caches):
+        if label in prefetch_cache.labels:
+            prefetch_cache.invalidate(sender)
+
+
+def connect_signals():
+    global _connected
+    if _connected:
+        return
+    for signal in (signals.post_save, signals.post_delete, signals.m2m_changed):
+        signal.connect(on_changed, dispatch_uid="aggressivequery.prefetch_cache.{}".format(id(signal)))
+    _connected = True
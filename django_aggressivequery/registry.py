@@ -0,0 +1,65 @@
+# -*- coding:utf-8 -*-
+from collections import namedtuple, OrderedDict
+from .warmup import _get_model
+
+
+NamedQuery = namedtuple(
+    "NamedQuery",
+    "name, model, name_list, more_specific"
+)
+
+
+def get_model_of_query(self):
+    return _get_model(self.model)
+
+
+NamedQuery.get_model = get_model_of_query
+
+
+class QueryRegistry(object):
+    """named queries, compiled ahead of time (see `manage.py aggressivequery_plans`)
+
+    model is a model class or "<app_label>.<ModelName>", resolved lazily.
+    """
+
+    def __init__(self):
+        self.queries = OrderedDict()  # Dict[name, NamedQuery]
+
+    def __len__(self):
+        return len(self.queries)
+
+    def __iter__(self):
+        return iter(list(self.queries.values()))
+
+    def __contains__(self, name):
+        return name in self.queries
+
+    def register(self, name, model, name_list, more_specific=False):
+        if not isinstance(name_list, (tuple, list)):
+            raise ValueError("name list is only tuple or list type. (['attr'] rather than 'attr')")
+        query = self.queries[name] = NamedQuery(name=name, model=model, name_list=list(name_list), more_specific=more_specific)
+        return query
+
+    def update(self, queries):
+        """queries is a dict, name -> (model, name_list) or (model, name_list, more_specific)"""
+        for name, query in queries.items():
+            self.register(name, query[0], query[1], more_specific=(query[2] if len(query) > 2 else False))
+        return self
+
+    def get(self, name):
+        return self.queries[name]
+
+    def from_queryset(self, name, qs=None, **kwargs):
+        """from_queryset() of the named query. qs is `model.objects.all()`, by default"""
+        from . import from_queryset
+        query = self.get(name)
+        if qs is None:
+            qs = query.get_model().objects.all()
+        kwargs.setdefault("more_specific", query.more_specific)
+        return from_queryset(qs, query.name_list, **kwargs)
+
+    def clear(self):
+        self.queries.clear()
+
+
+default_registry = QueryRegistry()
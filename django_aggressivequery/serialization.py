@@ -0,0 +1,166 @@
+# -*- coding:utf-8 -*-
+import json
+import hashlib
+import logging
+from collections import namedtuple
+from django.apps import apps
+from .plan import CompiledPlan, PrefetchSpec, intern_names, intern_spec
+from .cache import default_plan_cache
+from .extraction import get_all_fields
+logger = logging.getLogger(__name__)
+
+# changed when the layout of plan file is changed. files of other versions are rejected.
+FORMAT_VERSION = 1
+
+
+PlanLoadReport = namedtuple(
+    "PlanLoadReport",
+    "loaded, rejected"  # loaded: List[name], rejected: List[(name, reason)]
+)
+
+
+def model_label(model):
+    return "{}.{}".format(model._meta.app_label, model._meta.object_name)
+
+
+def model_signature(model):
+    """digest of model's metadata (fields, columns and relations). changed by schema changes"""
+    rows = []
+    for f in get_all_fields(model):
+        related_model = getattr(f, "related_model", None)
+        rows.append([
+            f.name,
+            f.__class__.__name__,
+            getattr(f, "column", None) or "",
+            model_label(related_model) if related_model is not None and not isinstance(related_model, str) else "",
+        ])
+    rows.sort()
+    return hashlib.sha1(json.dumps(rows).encode("utf-8")).hexdigest()[:16]
+
+
+def plan_models(plan):
+    """models which the plan depends on (root, joined and prefetched models)"""
+    models = [plan.model]
+    joins = [(plan.model, plan.select_related or ())]
+    for spec in plan.prefetch_list:
+        models.append(spec.model)
+        joins.append((spec.model, spec.select_related or ()))
+    for model, select_related in joins:
+        for name in select_related:
+            target = model
+            for k in name.split("__"):
+                target = target._meta.get_field(k).related_model
+                models.append(target)
+    r = []
+    for model in models:
+        if model not in r:
+            r.append(model)
+    return r
+
+
+def dump_plan(plan):
+    """CompiledPlan -> dict (json serializable)"""
+    prefetch_list = []
+    for spec in plan.prefetch_list:
+        if spec.is_custom:
+            raise ValueError("{!r} is custom prefetch, the plan is not serializable".format(spec.name))
+        prefetch_list.append({
+            "name": spec.name,
+            "lookup": spec.lookup,
+            "model": model_label(spec.model),
+            "to_attr": spec.to_attr,
+            "select_related": _list_or_none(spec.select_related),
+            "only": _list_or_none(spec.only),
+        })
+    return {
+        "model": model_label(plan.model),
+        "select_related": _list_or_none(plan.select_related),
+        "prefetch_list": prefetch_list,
+        "only": _list_or_none(plan.only),
+    }
+
+
+def load_plan(d):
+    """dict -> CompiledPlan. names and specs are interned, as compiled ones"""
+    prefetch_list = tuple(
+        intern_spec(PrefetchSpec(name=s["name"],
+                                 lookup=s["lookup"],
+                                 model=apps.get_model(s["model"]),
+                                 to_attr=s["to_attr"],
+                                 is_custom=False,
+                                 select_related=intern_names(s["select_related"]),
+                                 only=intern_names(s["only"])))
+        for s in d["prefetch_list"]
+    )
+    return CompiledPlan(model=apps.get_model(d["model"]),
+                        select_related=intern_names(d["select_related"]),
+                        prefetch_list=prefetch_list,
+                        only=intern_names(d["only"]))
+
+
+def _list_or_none(names):
+    return None if names is None else list(names)
+
+
+def dump_plans(queries, fp, cache=None):
+    """compiling named queries (registry.NamedQuery) and writing them to fp, as versioned json"""
+    from . import from_queryset
+
+    entries = []
+    for query in queries:
+        model = query.get_model()
+        plan = from_queryset(model.objects.all(), query.name_list, more_specific=query.more_specific, cache=cache).plan
+        entries.append({
+            "name": query.name,
+            "name_list": list(query.name_list),
+            "more_specific": query.more_specific,
+            "signatures": {model_label(m): model_signature(m) for m in plan_models(plan)},
+            "plan": dump_plan(plan),
+        })
+    json.dump({"version": FORMAT_VERSION, "plans": entries}, fp, separators=(",", ":"), sort_keys=True)
+    return entries
+
+
+def validate_entry(entry):
+    """reason why the entry is stale, or None"""
+    for label, signature in sorted(entry["signatures"].items()):
+        try:
+            model = apps.get_model(label)
+        except LookupError:
+            return "model {} is not found".format(label)
+        if model_signature(model) != signature:
+            return "model {} is changed".format(label)
+    return None
+
+
+def load_plans(fp, cache=default_plan_cache):
+    """reading plans written by dump_plans(), and storing them into the plan cache.
+
+    stale plans (compiled with other format version or other model metadata) are rejected,
+    these are compiled on first use, as usual.
+    """
+    from . import from_queryset
+
+    data = json.load(fp)
+    entries = data.get("plans", [])
+    if data.get("version") != FORMAT_VERSION:
+        reason = "format version {!r} is not supported (expected {!r})".format(data.get("version"), FORMAT_VERSION)
+        report = PlanLoadReport(loaded=[], rejected=[(e.get("name"), reason) for e in entries])
+        logger.warning("@plans: all plans are rejected, %s", reason)
+        return report
+
+    report = PlanLoadReport(loaded=[], rejected=[])
+    for entry in entries:
+        reason = validate_entry(entry)
+        if reason is not None:
+            logger.warning("@plans: %r is rejected, %s", entry["name"], reason)
+            report.rejected.append((entry["name"], reason))
+            continue
+        plan = load_plan(entry["plan"])
+        if cache is not None:
+            # the same key as compiled by from_queryset() (extraction is not needed)
+            aqs = from_queryset(plan.model.objects.all(), entry["name_list"], more_specific=entry["more_specific"], cache=cache)
+            cache.set(aqs.optimizer.cache_key, plan)
+        report.loaded.append(entry["name"])
+    logger.info("@plans: loaded=%d, rejected=%d", len(report.loaded), len(report.rejected))
+    return report
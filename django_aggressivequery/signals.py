@@ -0,0 +1,6 @@
+# -*- coding:utf-8 -*-
+from django.dispatch import Signal
+
+# sent after an AggressiveQuery is evaluated, if any receiver is connected.
+# arguments: sender (model class), aqs (AggressiveQuery), report (instrumentation.EvaluationReport)
+evaluated = Signal()
@@ -0,0 +1,135 @@
+# -*- coding:utf-8 -*-
+import logging
+from collections import namedtuple
+from django.db import connections, router, transaction, DatabaseError
+logger = logging.getLogger(__name__)
+
+JOIN = ":join"
+PREFETCH = ":prefetch"
+
+Decision = namedtuple(
+    "Decision",
+    "kind, reasons"
+)
+
+# rough size (bytes) of a column value, by field.get_internal_type()
+FIELD_WIDTHS = {
+    "AutoField": 4,
+    "BigAutoField": 8,
+    "SmallIntegerField": 2,
+    "PositiveSmallIntegerField": 2,
+    "IntegerField": 4,
+    "PositiveIntegerField": 4,
+    "BigIntegerField": 8,
+    "ForeignKey": 4,
+    "OneToOneField": 4,
+    "BooleanField": 1,
+    "NullBooleanField": 1,
+    "FloatField": 8,
+    "DecimalField": 16,
+    "DateField": 4,
+    "DateTimeField": 8,
+    "TimeField": 8,
+    "DurationField": 8,
+    "UUIDField": 16,
+    "TextField": 1024,
+    "BinaryField": 1024,
+}
+DEFAULT_FIELD_WIDTH = 32
+KEY_WIDTH = 4
+
+
+def estimate_field_width(field):
+    internal_type = field.get_internal_type()
+    if internal_type in FIELD_WIDTHS:
+        return FIELD_WIDTHS[internal_type]
+    max_length = getattr(field, "max_length", None)
+    if max_length:
+        return max(max_length // 2, 1)  # assuming half filled
+    return DEFAULT_FIELD_WIDTH
+
+
+def estimate_row_width(fields):
+    return sum(estimate_field_width(f) for f in fields if getattr(f, "concrete", True) and not getattr(f, "many_to_many", False))
+
+
+def estimate_table_rows(model, using=None):
+    """row count from database statistics (postgresql: pg_class, sqlite: sqlite_stat1), or None"""
+    connection = connections[using or router.db_for_read(model)]
+    if connection.vendor == "postgresql":
+        sql = "SELECT reltuples FROM pg_class WHERE relname = %s"
+    elif connection.vendor == "sqlite":
+        # available after ANALYZE. first number of stat is the number of rows
+        sql = "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1"
+    else:
+        return None
+    try:
+        # savepoint, a failed query must not abort the caller's transaction (e.g. postgresql in atomic block)
+        with transaction.atomic(using=connection.alias, savepoint=True):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [model._meta.db_table])
+                row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None:
+        return None
+    rows = int(float(str(row[0]).split(" ", 1)[0]))
+    return rows if rows >= 0 else None
+
+
+class CostBasedStrategy(object):
+    """choosing JOIN or prefetch for single valued relations (one to one, many to one), by estimated cost
+
+    - join cost: parent rows * width of joined columns
+    - prefetch cost: one more round trip + fetched child rows * width of selected columns + parent keys
+
+    overrides is a dict of full name -> ":join" or ":prefetch" (e.g. {"user__info": ":prefetch"}).
+    row_estimates is a dict of model (or "<app_label>.<ModelName>") -> number of rows,
+    otherwise database statistics are used.
+    """
+    roundtrip_cost = 100000
+
+    def __init__(self, overrides=None, row_estimates=None, roundtrip_cost=None, using=None):
+        self.overrides = overrides or {}
+        self.row_estimates = {_model_label(k): v for k, v in (row_estimates or {}).items()}
+        if roundtrip_cost is not None:
+            self.roundtrip_cost = roundtrip_cost
+        self.using = using
+        self.estimated = {}  # cache, Dict[model, Optional[int]]
+
+    def estimate_rows(self, model):
+        label = _model_label(model)
+        if label in self.row_estimates:
+            return self.row_estimates[label]
+        if model not in self.estimated:
+            self.estimated[model] = estimate_table_rows(model, using=self.using)
+        return self.estimated[model]
+
+    def choose(self, name, hint, result, default):
+        if name in self.overrides:
+            return Decision(kind=self.overrides[name], reasons=["overridden"])
+
+        parent_model, child_model = hint.field.model, hint.rel_model
+        parent_rows, child_rows = self.estimate_rows(parent_model), self.estimate_rows(child_model)
+        if parent_rows is None or child_rows is None:
+            return Decision(kind=default, reasons=["rows of {} are not estimated".format("parent" if parent_rows is None else "child")])
+
+        child_width = estimate_row_width(child_model._meta.concrete_fields)
+        selected_width = estimate_row_width(h.field for h in result.fields) or child_width
+        # sub fields of reverse one to one relation cannot be deferred, on join (django's limitation).
+        join_width = selected_width if hint.is_reverse_related else child_width
+        join_cost = parent_rows * join_width
+        prefetch_cost = self.roundtrip_cost + min(parent_rows, child_rows) * (selected_width + KEY_WIDTH) + parent_rows * KEY_WIDTH
+        reasons = [
+            "parent_rows={}".format(parent_rows),
+            "child_rows={}".format(child_rows),
+            "join_cost={}".format(join_cost),
+            "prefetch_cost={}".format(prefetch_cost),
+        ]
+        return Decision(kind=JOIN if join_cost <= prefetch_cost else PREFETCH, reasons=reasons)
+
+
+def _model_label(model):
+    if isinstance(model, str):
+        return model.lower()
+    return model._meta.label_lower
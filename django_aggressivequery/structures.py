@@ -1,5 +1,6 @@
 # -*- coding:utf-8 -*-
 from collections import namedtuple, defaultdict
+from .cache import LRUCache
 
 
 def tree():
@@ -22,12 +23,43 @@ Result = namedtuple(
     "Result",
     "name, fields, related, reverse_related, subresults"
 )
+ModelIndex = namedtuple(
+    "ModelIndex",
+    "kinds"
+)
 Pair = namedtuple(
     "Pair",
     "hint, result"
 )
 
 
+class ResultInterner(object):
+    """flyweight of Result.
+
+    Result nodes having the same name, hints and subresults are shared (e.g. between cached plans).
+    hints are shared per model and field by HintMap, so identity is enough for comparison.
+    """
+
+    def __init__(self, maxsize=8192):
+        self.cache = LRUCache(maxsize=maxsize)
+
+    def make(self, name, fields, related, reverse_related, subresults):
+        fields, related, reverse_related, subresults = tuple(fields), tuple(related), tuple(reverse_related), tuple(subresults)
+        # ids are stable, because the stored Result holds these objects
+        key = (name, tuple(map(id, fields)), tuple(map(id, related)), tuple(map(id, reverse_related)), tuple(map(id, subresults)))
+        return self.cache.get_or_create(
+            key,
+            lambda: Result(name=name, fields=fields, related=related, reverse_related=reverse_related, subresults=subresults)
+        )
+
+
+default_result_interner = ResultInterner()
+
+
+def make_result(name, fields, related, reverse_related, subresults, interner=None):
+    return (interner or default_result_interner).make(name, fields, related, reverse_related, subresults)
+
+
 def asdict_result(self):
     if not hasattr(self, "_asdict"):
         raise Exception("{!r} is not namedtuple".format(self))
@@ -43,11 +75,17 @@ def asdict_result(self):
 def repr_result(self):
     values = []
     for k, v in self._asdict().items():
+        if isinstance(v, tuple):
+            v = list(v)
         if v:
             values.append("{}={!r}".format(k, v))
     return "{}({})".format(self.__class__.__name__, ", ".join(values))
 
 
+def join_name(prefix, name):
+    return "{}__{}".format(prefix, name) if prefix else name
+
+
 def dict_from_keys(keys, separator="__"):
     """xxx__yyy__zzz -> {xxx: {yyy: {zzz: {}}}}"""
     d = tree()
@@ -61,12 +99,18 @@ def dict_from_keys(keys, separator="__"):
 
 
 def excluded_result(self, skip_dict):
-    skip_keys = {k for k, d in skip_dict.items() if len(d) == 0}
+    """skip_dict is a tree from dict_from_keys(), or a compiled namelist.NameTrie"""
+    if hasattr(skip_dict, "children"):  # NameTrie
+        skip_keys = set(skip_dict.names)
+        get_sub = skip_dict.child
+    else:
+        skip_keys = {k for k, d in skip_dict.items() if len(d) == 0}
+        get_sub = skip_dict.__getitem__
     fields = [h for h in self.fields if h.name not in skip_keys]
     related = [h for h in self.related if h.name not in skip_keys]
     reverse_related = [h for h in self.reverse_related if h.name not in skip_keys]
-    subresults = [excluded_result(sr, skip_dict[sr.name]) for sr in self.subresults if sr.name not in skip_keys]
-    return Result(name=self.name, fields=fields, related=related, reverse_related=reverse_related, subresults=subresults)
+    subresults = [excluded_result(sr, get_sub(sr.name)) for sr in self.subresults if sr.name not in skip_keys]
+    return make_result(name=self.name, fields=fields, related=related, reverse_related=reverse_related, subresults=subresults)
 
 
 Result.__repr__ = repr_result
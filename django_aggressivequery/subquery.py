@@ -0,0 +1,106 @@
+# -*- coding:utf-8 -*-
+import logging
+from collections import defaultdict
+from django.db.models import F, Prefetch
+from django.db.models.fields.reverse_related import ForeignObjectRel, ManyToManyRel
+from .guard import get_attributes
+from .structures import join_name
+logger = logging.getLogger(__name__)
+
+# annotation of child rows, the key of their parent
+PARENT_KEY = "_aggressivequery_parent_key"
+
+
+class SubqueryPrefetch(Prefetch):
+    """prefetching with `<relation> IN (<subquery>)`, instead of the list of parents' ids.
+
+    the subquery is derived from the root queryset (and the querysets of parent levels),
+    so the query doesn't depend on the results of parent levels.
+    """
+
+    def __init__(self, lookup, queryset, key_attname, back_reference=None):
+        super().__init__(lookup.prefetch_through, queryset=lookup.queryset, to_attr=lookup.to_attr)
+        self.subquery_queryset = queryset  # annotated with PARENT_KEY
+        self.key_attname = key_attname  # attribute of parent instance, compared with PARENT_KEY
+        self.back_reference = back_reference  # name of child's foreign key to parent (reverse many to one, one to one)
+
+
+def make_subquery_prefetchs(root_qs, prefetch_list, dependencies, paths):
+    """lookups whose prefetch_to are in paths are replaced with SubqueryPrefetch (if possible)"""
+    restricted = []  # List[queryset or None], queryset of each level restricted by the root queryset
+    r = []
+    for i, lookup in enumerate(prefetch_list):
+        parent = dependencies[i]
+        if parent is None:
+            base, base_path = root_qs, ""
+        else:
+            base, base_path = restricted[parent], prefetch_list[parent].prefetch_to
+        relation = None if base is None else resolve_relation(base.model, base_path, lookup.prefetch_through)
+        if relation is None:  # e.g. via custom prefetch (to_attr)
+            restricted.append(None)
+            r.append(lookup)
+            continue
+
+        rest, field, query_name, key_field = relation
+        child_qs = lookup.queryset if lookup.queryset is not None else field.related_model._default_manager.all()
+        keys_qs = base.order_by().values(join_name(rest, key_field.name))
+        restricted_qs = child_qs.filter(**{query_name + "__in": keys_qs})
+        restricted.append(restricted_qs)
+        if lookup.prefetch_to in paths:
+            logger.debug("@subquery: %r", lookup.prefetch_to)
+            back_reference = field.field.name if isinstance(field, ForeignObjectRel) and not field.many_to_many else None
+            r.append(SubqueryPrefetch(lookup, restricted_qs.annotate(**{PARENT_KEY: F(query_name)}), key_field.attname,
+                                      back_reference=back_reference))
+        else:
+            r.append(lookup)
+    return r
+
+
+def resolve_relation(model, base_path, through):
+    """-> (joined path from base, relation field, lookup name from child to parent, key field of parent) or None"""
+    tokens = through.split("__")
+    skipped = len(base_path.split("__")) if base_path else 0
+    rest = tokens[skipped:-1]
+    for name in rest:  # joined relations from base
+        field = get_attributes(model).get(name)
+        if field is None or not (field.many_to_one or field.one_to_one):
+            return None
+        model = field.related_model
+
+    field = get_attributes(model).get(tokens[-1])
+    if field is None or not field.is_relation:
+        return None
+    if isinstance(field, ForeignObjectRel):  # reverse relation
+        query_name = field.field.name
+        key_field = model._meta.pk if isinstance(field, ManyToManyRel) else field.field.target_field
+    else:
+        query_name = field.related_query_name()
+        key_field = model._meta.pk
+    return "__".join(rest), field, query_name, key_field
+
+
+def assign(parents, lookup):
+    """running the subquery, and setting children on parents (as prefetch_related_objects())"""
+    through_name = lookup.prefetch_through.rpartition("__")[2]
+    groups = defaultdict(list)
+    for ob in lookup.subquery_queryset:
+        groups[getattr(ob, PARENT_KEY)].append(ob)
+
+    descriptor = getattr(parents[0].__class__, through_name)
+    prefetcher = descriptor if hasattr(descriptor, "get_prefetch_queryset") else getattr(parents[0], through_name)
+    single, cache_name = prefetcher.get_prefetch_queryset(parents[:1], lookup.subquery_queryset.none())[3:5]  # no query
+    for ob in parents:
+        vals = groups.get(getattr(ob, lookup.key_attname), [])
+        if lookup.back_reference is not None:  # as prefetch_related_objects(), child.<fk> is parent
+            for child in vals:
+                setattr(child, lookup.back_reference, ob)
+        if single:
+            setattr(ob, lookup.to_attr or cache_name, vals[0] if vals else None)
+        elif lookup.to_attr:
+            setattr(ob, lookup.to_attr, vals)
+        else:
+            qs = getattr(ob, through_name).get_queryset()
+            qs._result_cache = vals
+            qs._prefetch_done = True
+            ob._prefetched_objects_cache[cache_name] = qs
+    return sum(len(vals) for vals in groups.values())
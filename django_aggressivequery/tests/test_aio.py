@@ -0,0 +1,83 @@
+# -*- coding:utf-8 -*-
+import asyncio
+import unittest
+from django.test import TestCase, TransactionTestCase
+from . import models as m
+
+
+class PrefetchDependenciesTests(unittest.TestCase):
+    def _callFUT(self, prefetch_list):
+        from django_aggressivequery.execution import prefetch_dependencies, as_prefetch
+        return prefetch_dependencies([as_prefetch(lookup) for lookup in prefetch_list])
+
+    def test_it(self):
+        prefetch_list = ["orders", "orders__items", "customerposition_set", "orders__items__subitems", "orders__customers"]
+        self.assertEqual(self._callFUT(prefetch_list), [None, 0, None, 1, 0])
+
+    def test_via_join(self):
+        self.assertEqual(self._callFUT(["customer__orders", "customer__orders__items"]), [None, 0])
+
+
+# queries are run in other threads, so data must be committed (TransactionTestCase)
+class AsyncEvaluationTests(TransactionTestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery import from_queryset
+        return from_queryset(*args, **kwargs)
+
+    def setUp(self):
+        for i in range(3):
+            customer = m.Customer.objects.create(name="customer-{}".format(i))
+            m.CustomerKarma.objects.create(customer=customer, point=i)
+            m.CustomerPosition.objects.create(customer=customer, substitute=customer, name="position-{}".format(i))
+            order = m.Order.objects.create(name="order-{}".format(i))
+            order.customers.add(customer)
+            m.Item.objects.create(name="order-{}-item".format(i), order=order)
+
+    def _describe(self, customers):
+        return [
+            (c.name, c.karma.point, [p.name for p in c.customerposition_set.all()],
+             [(o.name, [item.name for item in o.items.all()]) for o in c.orders.all()])
+            for c in customers
+        ]
+
+    def _run(self, coro):
+        return asyncio.get_event_loop().run_until_complete(coro)
+
+    def test_aevaluate(self):
+        name_list = ["karma", "customerposition_set", "orders__items"]
+        expected = self._describe(self._makeOne(m.Customer.objects.order_by("id"), name_list))
+
+        aqs = self._makeOne(m.Customer.objects.order_by("id"), name_list)
+        customers = self._run(aqs.aevaluate())
+        with self.assertNumQueries(0):
+            self.assertEqual(self._describe(customers), expected)
+        self.assertEqual([s.name for s in aqs.prefetch_stats], ["customerposition_set", "orders", "orders__items"])
+        self.assertIs(self._run(aqs.aevaluate()), customers)  # cached
+
+    def test_async_for(self):
+        async def collect(aqs):
+            return [c.name async for c in aqs]
+
+        aqs = self._makeOne(m.Customer.objects.order_by("id"), ["orders"])
+        self.assertEqual(self._run(collect(aqs)), ["customer-0", "customer-1", "customer-2"])
+        with self.assertNumQueries(0):
+            self.assertEqual(list(aqs)[0].orders.all()[0].name, "order-0")
+
+
+class AsyncEvaluationInAtomicBlockTests(TestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery import from_queryset
+        return from_queryset(*args, **kwargs)
+
+    def test_uncommitted_rows_are_visible(self):
+        customer = m.Customer.objects.create(name="customer-0")
+        order = m.Order.objects.create(name="order-0")
+        order.customers.add(customer)
+        m.CustomerPosition.objects.create(customer=customer, substitute=customer, name="position-0")
+
+        aqs = self._makeOne(m.Customer.objects.order_by("id"), ["customerposition_set", "orders"])
+        with self.assertNumQueries(3):
+            customers = asyncio.get_event_loop().run_until_complete(aqs.aevaluate())
+        with self.assertNumQueries(0):
+            actual = [(c.name, [p.name for p in c.customerposition_set.all()], [o.name for o in c.orders.all()]) for c in customers]
+        self.assertEqual(actual, [("customer-0", ["position-0"], ["order-0"])])
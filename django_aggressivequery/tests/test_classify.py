@@ -126,3 +126,39 @@ class ExtractorClassifyTests(TestCase):
         query2 = ["customer__karma", "customer__*__*"]
         actual21 = self._makeOne().extract(model, query2)
         self.assertEqual(str(actual11), str(actual21))
+
+
+class ExtractorDrilldownTests(TestCase):
+    def _makeOne(self):
+        from django_aggressivequery.extraction import HintExtractor
+        return HintExtractor()
+
+    def test_deep__without_recursion_error(self):
+        import sys
+        n = sys.getrecursionlimit()
+        query = ["__".join(["orders", "customers"] * n + ["name"])]
+        actual = self._makeOne().extract(m.Customer, query)
+        depth = 0
+        while actual.subresults:
+            actual = actual.subresults[0]
+            depth += 1
+        self.assertEqual(depth, 2 * n)
+        self.assertEqual([h.name for h in actual.fields], ["name"])
+
+    def test_shared_subtrees(self):
+        # Customer -* CustomerPosition, via customer and substitute
+        actual = self._makeOne().extract(m.CustomerPosition, ["customer__orders__*", "substitute__orders__*"])
+        customer, substitute = actual.subresults
+        self.assertEqual(str(customer.subresults), str(substitute.subresults))
+        self.assertIs(customer.subresults[0], substitute.subresults[0])
+
+    def test_star_and_explicit_name__merged(self):
+        actual = self._makeOne().extract(m.Order, ["*__name", "items__price"])
+        expected = "Result(name='items', fields=[Hint(name='name'), Hint(name='price')])"
+        self.assertEqual(str(actual.subresults[1]), expected)
+
+    def test_interned__between_extractions(self):
+        actual0 = self._makeOne().extract(m.Order, ["*__*"])
+        actual1 = self._makeOne().extract(m.Order, ["*__*", "items__name"])
+        self.assertIs(actual0, actual1)
+        self.assertIsInstance(actual0.subresults, tuple)
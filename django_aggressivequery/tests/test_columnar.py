@@ -0,0 +1,61 @@
+# -*- coding:utf-8 -*-
+import unittest
+from django.test import TestCase
+from . import models as m
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class AsColumnsTests(TestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery import from_queryset
+        return from_queryset(*args, **kwargs)
+
+    def setUp(self):
+        foo = m.Customer.objects.create(name="foo")
+        m.CustomerKarma.objects.create(point=5, customer=foo)
+        bar = m.Customer.objects.create(name="bar")
+        m.Customer.objects.create(name="boo")
+
+        order1 = m.Order.objects.create(name="order-1", price=100)
+        m.Item.objects.create(name="order-1-item-a", order=order1, price=10)
+        m.Item.objects.create(name="order-1-item-b", order=order1, price=20)
+        order2 = m.Order.objects.create(name="order-2", price=200)
+        m.Item.objects.create(name="order-2-item-a", order=order2, price=30)
+        order1.customers.add(foo)
+        order1.customers.add(bar)
+        order2.customers.add(bar)
+
+    def _callFUT(self, use_numpy):
+        aqs = self._makeOne(m.Customer.objects.order_by("id"), ["name", "karma__point", "orders__price", "orders__items__price"], more_specific=True)
+        with self.assertNumQueries(3):
+            return aqs.as_columns(use_numpy=use_numpy)
+
+    def test_it(self):
+        import array
+        levels = self._callFUT(use_numpy=False)
+        self.assertEqual(list(levels.keys()), ["", "orders", "orders__items"])
+
+        root = levels[""]
+        self.assertEqual((root.model, root.size, root.offsets), (m.Customer, 3, None))
+        self.assertEqual(root.columns["name"], ["foo", "bar", "boo"])
+        self.assertEqual(root.columns["karma__point"], [5, None, None])
+
+        orders = levels["orders"]
+        self.assertEqual(orders.columns["price"], array.array("q", [100, 100, 200]))
+        self.assertEqual(orders.offsets, array.array("q", [0, 1, 3, 3]))
+        self.assertEqual(list(orders.children_of(1, "price")), [100, 200])
+
+        items = levels["orders__items"]
+        self.assertEqual(items.columns["price"], array.array("q", [10, 20, 10, 20, 30]))
+        self.assertEqual(items.offsets, array.array("q", [0, 2, 4, 5]))
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy(self):
+        levels = self._callFUT(use_numpy=True)
+        items = levels["orders__items"]
+        self.assertEqual(items.columns["price"].dtype, numpy.int64)
+        self.assertEqual(int(items.columns["price"].sum()), 90)
+        self.assertEqual(list(numpy.add.reduceat(items.columns["price"], items.offsets[:-1])), [30, 30, 30])
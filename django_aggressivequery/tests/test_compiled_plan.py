@@ -0,0 +1,59 @@
+# -*- coding:utf-8 -*-
+from django.test import TestCase
+from . import models as m
+
+
+class CompiledPlanTests(TestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery import from_queryset
+        return from_queryset(*args, cache=None, **kwargs)
+
+    def test_it(self):
+        aqs = self._makeOne(m.CustomerKarma.objects.all(), ["point", "customer__name", "customer__orders__name"], more_specific=True)
+        plan = aqs.plan
+        self.assertEqual(plan.model, m.CustomerKarma)
+        self.assertEqual(plan.select_related, ("customer",))
+        self.assertEqual([spec.lookup for spec in plan.prefetch_list], ["customer__orders"])
+        self.assertEqual(plan.prefetch_list[0].only, ("name", "customers"))
+        self.assertEqual(plan.only, ("point", "customer__name"))
+
+    def test_apply__another_queryset(self):
+        aqs = self._makeOne(m.Order.objects.all(), ["items"])
+        qs = aqs.plan.apply(m.Order.objects.filter(price__gt=0))
+        self.assertIn('"order"."price" > 0', str(qs.query))
+        self.assertEqual([p.prefetch_through for p in qs._prefetch_related_lookups], ["items"])
+
+    def test_apply__model_mismatch(self):
+        aqs = self._makeOne(m.Order.objects.all(), ["items"])
+        with self.assertRaises(ValueError):
+            aqs.plan.apply(m.Item.objects.all())
+
+    def test_apply__custom_prefetch_is_required(self):
+        from django.db.models import Prefetch
+        prefetch = Prefetch("items", m.Item.objects.filter(price__gt=0), to_attr="valuable_items")
+        aqs = self._makeOne(m.Order.objects.all(), ["valuable_items"]).custom_prefetch(valuable_items=prefetch)
+        with self.assertRaisesRegex(ValueError, "valuable_items"):
+            aqs.plan.apply(m.Order.objects.all())
+        qs = aqs.plan.apply(m.Order.objects.all(), custom_prefetchs={"valuable_items": prefetch})
+        self.assertEqual([p.to_attr for p in qs._prefetch_related_lookups], ["valuable_items"])
+
+    def test_pickle(self):
+        import pickle
+        aqs = self._makeOne(m.Customer.objects.all(), ["karma", "orders__items__subitems"])
+        plan = pickle.loads(pickle.dumps(aqs.plan))
+        self.assertEqual(plan, aqs.plan)
+        self.assertEqual(str(plan.apply(m.Customer.objects.all()).query), str(aqs.query))
+
+    def test_asdict(self):
+        import json
+        aqs = self._makeOne(m.Customer.objects.all(), ["orders"])
+        d = json.loads(json.dumps(aqs.plan.asdict()))
+        self.assertEqual(d["model"], "Customer")
+        self.assertEqual(d["prefetch_list"][0]["lookup"], "orders")
+        self.assertEqual(d["prefetch_list"][0]["model"], "Order")
+
+    def test_prefetch_specs__shared_between_plans(self):
+        plan0 = self._makeOne(m.Order.objects.all(), ["items__subitems"]).plan
+        plan1 = self._makeOne(m.Order.objects.all(), ["items__subitems", "name"]).plan
+        self.assertIsNot(plan0, plan1)
+        self.assertIs(plan0.prefetch_list[0], plan1.prefetch_list[0])
@@ -0,0 +1,58 @@
+# -*- coding:utf-8 -*-
+from django.test import TestCase
+from . import models as m
+
+
+class CountTests(TestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery import from_queryset
+        return from_queryset(*args, **kwargs)
+
+    def setUp(self):
+        foo = m.Customer.objects.create(name="foo")
+        m.CustomerKarma.objects.create(point=1, customer=foo)
+        m.Customer.objects.create(name="bar")
+        order = m.Order.objects.create(name="order-1")
+        order.customers.add(foo)
+
+    def test_count(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        aqs = self._makeOne(m.Customer.objects.select_related("karma").only("name"), ["name", "karma__point", "orders"])
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(aqs.count(), 2)
+            self.assertEqual(len(aqs), 2)  # cached
+            self.assertTrue(aqs.exists())
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn("JOIN", ctx.captured_queries[0]["sql"])
+
+    def test_filtered(self):
+        aqs = self._makeOne(m.Customer.objects.filter(orders__name="order-1"), ["karma", "orders"])
+        self.assertEqual(aqs.count(), 1)
+        aqs = self._makeOne(m.Customer.objects.filter(karma__isnull=True), ["karma"])
+        self.assertEqual(aqs.count(), 1)
+
+    def test_exists(self):
+        aqs = self._makeOne(m.Customer.objects.filter(name="boo"), ["karma", "orders"])
+        with self.assertNumQueries(1):
+            self.assertFalse(aqs.exists())
+            self.assertFalse(aqs.exists())
+
+    def test_after_evaluation(self):
+        aqs = self._makeOne(m.Customer.objects.all(), ["orders"])
+        with self.assertNumQueries(2):
+            self.assertEqual(len(list(aqs)), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(aqs.count(), 2)
+            self.assertEqual(len(aqs), 2)
+            self.assertTrue(aqs.exists())
+
+    def test_sliced(self):
+        aqs = self._makeOne(m.Customer.objects.order_by("id")[1:], ["karma"])
+        self.assertEqual(aqs.count(), 1)
+
+    def test_bool__evaluating(self):
+        aqs = self._makeOne(m.Customer.objects.all(), ["orders"])
+        with self.assertNumQueries(2):
+            if aqs:
+                self.assertEqual(len(list(aqs)), 2)
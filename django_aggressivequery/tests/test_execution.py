@@ -0,0 +1,105 @@
+# -*- coding:utf-8 -*-
+from django.test import TestCase, TransactionTestCase
+from . import models as m
+
+
+class PrefetchBatchSizeTests(TestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery import from_queryset
+        return from_queryset(*args, **kwargs)
+
+    def setUp(self):
+        customer = m.Customer.objects.create(name="foo")
+        for i in range(5):
+            order = m.Order.objects.create(name="order-{}".format(i))
+            order.customers.add(customer)
+            for j in range(2):
+                item = m.Item.objects.create(name="order-{}-item-{}".format(i, j), order=order)
+                m.SubItem.objects.create(name="order-{}-item-{}-sub".format(i, j), item=item)
+
+    def _describe(self, orders):
+        return [
+            (order.name, [(item.name, [sub.name for sub in item.subitems.all()]) for item in order.items.all()])
+            for order in orders
+        ]
+
+    def test_it(self):
+        expected = self._describe(self._makeOne(m.Order.objects.all(), ["items__subitems"]))
+
+        aqs = self._makeOne(m.Order.objects.all(), ["items__subitems"], prefetch_batch_size=2)
+        # orders: 1, items: 3 (2 + 2 + 1 orders), subitems: 5 (10 items)
+        with self.assertNumQueries(9):
+            actual = self._describe(aqs)
+        self.assertEqual(actual, expected)
+        self.assertEqual(
+            [(s.name, s.model, s.batches, s.rows) for s in aqs.prefetch_stats],
+            [("items", m.Item, 3, 10), ("items__subitems", m.SubItem, 5, 10)]
+        )
+
+    def test_without_batch_size(self):
+        aqs = self._makeOne(m.Order.objects.all(), ["items__subitems"])
+        with self.assertNumQueries(3):
+            self._describe(aqs)
+        self.assertEqual([s.batches for s in aqs.prefetch_stats], [1, 1])
+
+    def test_many_to_many__with_filter(self):
+        aqs = self._makeOne(m.Customer.objects.all(), ["orders__items"], prefetch_batch_size=1)
+        aqs = aqs.prefetch_filter(orders__items=lambda qs: qs.filter(name__endswith="-1"))
+        with self.assertNumQueries(7):
+            actual = [(o.name, [i.name for i in o.items.all()]) for c in aqs for o in c.orders.all()]
+        self.assertEqual(actual, [("order-{}".format(i), ["order-{}-item-1".format(i)]) for i in range(5)])
+
+    def test_invalid_batch_size(self):
+        with self.assertRaises(ValueError):
+            self._makeOne(m.Order.objects.all(), ["items"], prefetch_batch_size=0)
+
+
+# sibling levels are run on other connections, so data must be committed (TransactionTestCase)
+class ParallelPrefetchTests(TransactionTestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery import from_queryset
+        return from_queryset(*args, **kwargs)
+
+    def setUp(self):
+        for i in range(3):
+            customer = m.Customer.objects.create(name="customer-{}".format(i))
+            m.CustomerPosition.objects.create(customer=customer, substitute=customer, name="position-{}".format(i))
+            order = m.Order.objects.create(name="order-{}".format(i))
+            order.customers.add(customer)
+            m.Item.objects.create(name="order-{}-item".format(i), order=order)
+
+    def _describe(self, customers):
+        return [
+            (c.name, [p.name for p in c.customerposition_set.all()],
+             [(o.name, [item.name for item in o.items.all()]) for o in c.orders.all()])
+            for c in customers
+        ]
+
+    def test_it(self):
+        name_list = ["customerposition_set", "orders__items"]
+        expected = self._describe(self._makeOne(m.Customer.objects.order_by("id"), name_list))
+
+        aqs = self._makeOne(m.Customer.objects.order_by("id"), name_list, prefetch_workers=2)
+        # only root query is run on this thread's connection
+        with self.assertNumQueries(1):
+            actual = self._describe(aqs)
+        self.assertEqual(actual, expected)
+        self.assertEqual(
+            [(s.name, s.rows) for s in aqs.prefetch_stats],
+            [("customerposition_set", 3), ("orders", 3), ("orders__items", 3)]
+        )
+
+    def test_in_atomic_block__sequential(self):
+        from django.db import transaction
+        with transaction.atomic():
+            m.CustomerPosition.objects.create(customer=m.Customer.objects.get(name="customer-0"),
+                                              substitute=m.Customer.objects.get(name="customer-0"),
+                                              name="uncommitted")
+            aqs = self._makeOne(m.Customer.objects.filter(name="customer-0"), ["customerposition_set", "orders__items"], prefetch_workers=2)
+            with self.assertNumQueries(4):
+                actual = self._describe(aqs)
+        self.assertEqual(actual, [("customer-0", ["position-0", "uncommitted"], [("order-0", ["order-0-item"])])])
+
+    def test_invalid_workers(self):
+        with self.assertRaises(ValueError):
+            self._makeOne(m.Order.objects.all(), ["items"], prefetch_workers=0)
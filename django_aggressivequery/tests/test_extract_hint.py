@@ -76,3 +76,23 @@ class ExtractHintDictTests(TestCase):
             'customer',
         ]
         self.assertEqual(tuple(sorted(candidates.keys())), tuple(sorted(expected)))
+
+
+class HintMapIndexTests(TestCase):
+    def _makeOne(self):
+        from django_aggressivequery.extraction import HintMap
+        return HintMap()
+
+    def test_it(self):
+        index = self._makeOne().index(m.Item)
+        self.assertEqual(index.kinds, {"order": (":join", ":prefetch"), "subitems": (":prefetch", )})
+
+    def test_one_to_one(self):
+        hintmap = self._makeOne()
+        self.assertEqual(hintmap.index(m.Customer).kinds["karma"], (":join", ))
+        self.assertEqual(hintmap.index(m.CustomerKarma).kinds["customer"], (":join", ))
+        self.assertEqual(hintmap.index(m.Customer).kinds["orders"], (":prefetch", ))
+
+    def test_cached(self):
+        hintmap = self._makeOne()
+        self.assertIs(hintmap.index(m.Order), hintmap.index(m.Order))
@@ -0,0 +1,69 @@
+# -*- coding:utf-8 -*-
+from django.test import TestCase
+from . import models as m
+
+
+class GuardTests(TestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery import from_queryset
+        return from_queryset(*args, **kwargs)
+
+    def setUp(self):
+        customer = m.Customer.objects.create(name="foo")
+        m.CustomerKarma.objects.create(customer=customer, point=10)
+        order = m.Order.objects.create(name="order")
+        order.customers.add(customer)
+        item = m.Item.objects.create(name="item", order=order)
+        m.SubItem.objects.create(name="subitem", item=item)
+
+    def test_it(self):
+        aqs = self._makeOne(m.Order.objects.all(), ["items"]).guard()
+        with self.assertNumQueries(2):
+            orders = list(aqs)
+            for order in orders:
+                self.assertIsInstance(order, m.Order)
+                for item in order.items.all():
+                    self.assertEqual(item.name, "item")
+        self.assertEqual(aqs.tracker.missing, [])
+
+    def test_missing_relation(self):
+        aqs = self._makeOne(m.Order.objects.all(), ["items"]).guard()
+        with self.assertLogs("django_aggressivequery.guard", level="WARNING") as cm:
+            for order in aqs:
+                for item in order.items.all():
+                    [sub.name for sub in item.subitems.all()]
+                [c.karma.point for c in order.customers.all()]
+        self.assertEqual(len(cm.output), 3)
+        self.assertEqual(aqs.tracker.missing, ["items__subitems", "customers", "customers__karma"])
+        self.assertEqual(aqs.tracker.suggestion(), ["items", "customers", "customers__karma", "items__subitems"])
+
+    def test_missing_forward_relation(self):
+        aqs = self._makeOne(m.Item.objects.all(), ["subitems"]).guard()
+        with self.assertLogs("django_aggressivequery.guard", level="WARNING"):
+            for item in aqs:
+                item.order.name
+        self.assertEqual(aqs.tracker.missing, ["order"])
+
+    def test_missing_deferred_field(self):
+        aqs = self._makeOne(m.Order.objects.all(), ["name", "items__name"], more_specific=True).guard()
+        with self.assertLogs("django_aggressivequery.guard", level="WARNING"):
+            for order in aqs:
+                order.name
+                for item in order.items.all():
+                    item.name
+                    item.price
+        self.assertEqual(aqs.tracker.missing, ["items__price"])
+
+    def test_raise_exception(self):
+        from django_aggressivequery import MissingNameError
+        aqs = self._makeOne(m.Customer.objects.all(), ["karma"]).guard(raise_exception=True)
+        order = list(aqs)[0]
+        with self.assertRaises(MissingNameError) as cm:
+            order.orders.all()
+        self.assertEqual(cm.exception.suggestion, ["karma", "orders"])
+
+    def test_settings(self):
+        with self.settings(AGGRESSIVEQUERY_GUARD="warn"):
+            aqs = self._makeOne(m.Order.objects.all(), ["items"])
+        self.assertIsNotNone(aqs.tracker)
+        self.assertIsNone(self._makeOne(m.Order.objects.all(), ["items"]).tracker)
@@ -0,0 +1,69 @@
+# -*- coding:utf-8 -*-
+from django.test import TestCase
+from . import models as m
+
+
+class EvaluatedSignalTests(TestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery import from_queryset
+        return from_queryset(*args, **kwargs)
+
+    def setUp(self):
+        from django_aggressivequery.signals import evaluated
+        self.reports = []
+        evaluated.connect(self._receive, sender=m.Order)
+        self.addCleanup(evaluated.disconnect, self._receive, sender=m.Order)
+
+        for i in range(3):
+            order = m.Order.objects.create(name="order-{}".format(i))
+            for j in range(2):
+                m.Item.objects.create(name="order-{}-item-{}".format(i, j), order=order)
+
+    def _receive(self, sender, aqs, report, **kwargs):
+        self.reports.append(report)
+
+    def test_it(self):
+        aqs = self._makeOne(m.Order.objects.all(), ["items"], prefetch_batch_size=2)
+        list(aqs)
+        list(aqs)  # evaluated only once
+        self.assertEqual(len(self.reports), 1)
+
+        report = self.reports[0]
+        self.assertEqual(report.model, m.Order)
+        self.assertEqual([(s.name, s.queries, s.rows) for s in report.levels], [("", 1, 3), ("items", 2, 6)])
+        self.assertEqual((report.queries, report.rows), (3, 9))
+        self.assertGreater(report.bytes, 0)
+        self.assertGreaterEqual(report.elapsed, report.planning_time)
+
+    def test_more_specific__less_bytes(self):
+        list(self._makeOne(m.Order.objects.all(), ["items"]))
+        list(self._makeOne(m.Order.objects.all(), ["name", "items__name"], more_specific=True))
+        self.assertGreater(self.reports[0].bytes, self.reports[1].bytes)
+
+    def test_not_sent__other_model(self):
+        list(self._makeOne(m.Item.objects.all(), ["order"]))
+        self.assertEqual(self.reports, [])
+
+
+class QueryCounterTests(TestCase):
+    def _makeOne(self, using="default"):
+        from django_aggressivequery.instrumentation import QueryCounter
+        return QueryCounter(using)
+
+    def test_it(self):
+        with self._makeOne() as counter:
+            list(m.Order.objects.all())
+            list(m.Item.objects.all())
+        self.assertEqual(counter.count, 2)
+
+    def test_queries_log_is_full(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.addCleanup(connection.queries_log.clear)
+        with CaptureQueriesContext(connection):
+            for _ in range(connection.queries_log.maxlen):
+                connection.queries_log.append({"sql": "", "time": "0"})
+            with self._makeOne() as counter:
+                list(m.Order.objects.all())
+                list(m.Item.objects.all())
+        self.assertEqual(counter.count, 2)
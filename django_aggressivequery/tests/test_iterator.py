@@ -0,0 +1,38 @@
+# -*- coding:utf-8 -*-
+from django.test import TestCase
+from . import models as m
+
+
+class ChunkedIteratorTests(TestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery import from_queryset
+        return from_queryset(*args, **kwargs)
+
+    def setUp(self):
+        for i in range(5):
+            order = m.Order.objects.create(name="order-{}".format(i))
+            for j in range(i):
+                m.Item.objects.create(name="order-{}-item-{}".format(i, j), order=order)
+
+    def _describe(self, orders):
+        return [(order.name, [item.name for item in order.items.all()]) for order in orders]
+
+    def test_it(self):
+        aqs = self._makeOne(m.Order.objects.all(), ["items"])
+        expected = self._describe(aqs)
+        # 3 chunks (2 + 2 + 1), and prefetching items for each chunk
+        with self.assertNumQueries(6):
+            actual = self._describe(aqs.iterator(chunk_size=2))
+        self.assertEqual(actual, expected)
+
+    def test_it__exactly_divided(self):
+        aqs = self._makeOne(m.Order.objects.filter(name__gt="order-0"), ["items"])
+        # 2 chunks, and one more query to detect the end
+        with self.assertNumQueries(5):
+            actual = self._describe(aqs.iterator(chunk_size=2))
+        self.assertEqual([name for name, _ in actual], ["order-1", "order-2", "order-3", "order-4"])
+
+    def test_it__sliced(self):
+        aqs = self._makeOne(m.Order.objects.all()[:2], ["items"])
+        with self.assertRaises(ValueError):
+            list(aqs.iterator(chunk_size=2))
@@ -0,0 +1,72 @@
+# -*- coding:utf-8 -*-
+import json
+from django.test import TestCase
+from . import models as m
+
+
+class AsJSONTests(TestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery import from_queryset
+        return from_queryset(*args, **kwargs)
+
+    def setUp(self):
+        foo = m.Customer.objects.create(name="foo")
+        m.CustomerKarma.objects.create(point=0, customer=foo)
+        bar = m.Customer.objects.create(name="bar")
+        m.CustomerPosition.objects.create(name="1st", customer=foo, substitute=bar)
+
+        order1 = m.Order.objects.create(name="order-1")
+        m.Item.objects.create(name="order-1-item-a", order=order1, price=10)
+        m.Item.objects.create(name="order-1-item-b", order=order1, price=20)
+        order2 = m.Order.objects.create(name="order-2")
+        order1.customers.add(foo)
+        order1.customers.add(bar)
+        order2.customers.add(bar)
+
+    def test_it(self):
+        aqs = self._makeOne(m.Customer.objects.order_by("id"), ["name", "karma__point", "orders__name", "orders__items__name"], more_specific=True)
+        with self.assertNumQueries(1):
+            actual = aqs.as_json()
+        expected = [
+            {"name": "foo", "karma": {"point": 0},
+             "orders": [{"name": "order-1", "items": [{"name": "order-1-item-a"}, {"name": "order-1-item-b"}]}]},
+            {"name": "bar", "karma": None,
+             "orders": [{"name": "order-1", "items": [{"name": "order-1-item-a"}, {"name": "order-1-item-b"}]},
+                        {"name": "order-2", "items": []}]},
+        ]
+        self.assertEqual(actual, expected)
+
+    def test_same_as_dicts(self):
+        candidates = [
+            (m.Item.objects.order_by("id"), ["name", "order__name", "order__customers__name"]),
+            (m.CustomerPosition.objects.order_by("id"), ["name", "substitute__name", "customer__orders__price"]),
+            (m.Order.objects.filter(name="order-1"), ["id", "items__price"]),
+        ]
+        for qs, name_list in candidates:
+            with self.subTest(name_list=name_list):
+                aqs = self._makeOne(qs, name_list, more_specific=True)
+                with self.assertNumQueries(1):
+                    actual = aqs.as_json()
+                self.assertEqual(actual, aqs.as_dicts())
+
+    def test_prefetch_filter(self):
+        aqs = self._makeOne(m.Order.objects.order_by("id"), ["name", "items__name"], more_specific=True)
+        aqs = aqs.prefetch_filter(items=lambda qs: qs.filter(price__gt=10))
+        self.assertEqual(aqs.as_json(), [{"name": "order-1", "items": [{"name": "order-1-item-b"}]}, {"name": "order-2", "items": []}])
+
+    def test_sliced(self):
+        aqs = self._makeOne(m.Customer.objects.order_by("-id")[:1], ["name", "orders__name"], more_specific=True)
+        self.assertEqual(aqs.as_json(), [{"name": "bar", "orders": [{"name": "order-1"}, {"name": "order-2"}]}])
+
+    def test_without_decoding(self):
+        aqs = self._makeOne(m.Order.objects.order_by("id"), ["name"], more_specific=True)
+        actual = aqs.as_json(decode=False)
+        self.assertEqual([json.loads(doc) for doc in actual], [{"name": "order-1"}, {"name": "order-2"}])
+
+    def test_custom_prefetch__not_supported(self):
+        from django.db.models import Prefetch
+        aqs = self._makeOne(m.Order.objects.all(), ["positive_items"]).custom_prefetch(
+            positive_items=Prefetch("items", m.Item.objects.filter(price__gte=0), to_attr="positive_items")
+        )
+        with self.assertRaises(ValueError):
+            aqs.as_json()
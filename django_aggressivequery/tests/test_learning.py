@@ -0,0 +1,54 @@
+# -*- coding:utf-8 -*-
+from django.test import TestCase
+from . import models as m
+
+
+class LearnerTests(TestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery import Learner
+        return Learner(*args, **kwargs)
+
+    def setUp(self):
+        customer = m.Customer.objects.create(name="foo")
+        m.CustomerKarma.objects.create(customer=customer, point=10)
+        order = m.Order.objects.create(name="order")
+        order.customers.add(customer)
+        m.Item.objects.create(name="item", order=order)
+
+    def _serialize(self, aqs):
+        return [
+            {
+                "name": order.name,
+                "items": [item.name for item in order.items.all()],
+                "karma": [c.karma.point for c in order.customers.all()],
+            }
+            for order in aqs
+        ]
+
+    def test_it(self):
+        learner = self._makeOne()
+        aqs = learner.from_queryset(m.Order.objects.all(), ["items", "customers__karma"], key="k")
+        self._serialize(aqs)
+        self.assertEqual(learner.suggestion("k"), ["customers__karma__point", "items__name", "name"])
+        self.assertIsNone(learner.suggestion("another"))
+
+    def test_relation_only__pk_is_selected(self):
+        learner = self._makeOne()
+        aqs = learner.from_queryset(m.Order.objects.all(), ["items"], key="k")
+        [len(order.items.all()) for order in aqs]
+        self.assertEqual(learner.suggestion("k"), ["items__id"])
+
+    def test_auto_apply(self):
+        learner = self._makeOne(auto_apply=True)
+        for i in range(2):
+            aqs = learner.from_queryset(m.Order.objects.all(), ["items", "customers__karma"])
+            self.assertEqual(self._serialize(aqs), [{"name": "order", "items": ["item"], "karma": [10]}])
+        self.assertEqual(aqs.name_list, ["customers__karma__point", "items__name", "name"])
+        self.assertEqual(aqs.plan.only, ("name",))
+
+    def test_call_site__key(self):
+        learner = self._makeOne()
+        for i in range(2):
+            learner.from_queryset(m.Order.objects.all(), ["items"])
+        learner.from_queryset(m.Order.objects.all(), ["items"])
+        self.assertEqual(sorted(learner.samples.values()), [1, 2])
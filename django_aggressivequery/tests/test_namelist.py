@@ -0,0 +1,40 @@
+# -*- coding:utf-8 -*-
+from django.test import TestCase
+
+
+class CompileNameListTests(TestCase):
+    def _callFUT(self, *args, **kwargs):
+        from django_aggressivequery.namelist import compile_name_list
+        return compile_name_list(*args, **kwargs)
+
+    def test_it(self):
+        trie = self._callFUT(["name", "items__name", "items__subitems__*"])
+        self.assertEqual(trie.names, ("name", ))
+        self.assertEqual(list(trie.iter_names()), ["name", "items__name", "items__subitems__*"])
+        self.assertEqual(trie.child("items").child("subitems").names, ("*", ))
+        self.assertEqual(trie.child("customers").names, ())
+
+    def test_interned__order_is_ignored(self):
+        trie0 = self._callFUT(["items__subitems", "customers__name"])
+        trie1 = self._callFUT(["customers__name", "items__subitems", "items__subitems"])
+        self.assertIs(trie0, trie1)
+
+    def test_include_star(self):
+        from django_aggressivequery import include_star_selection
+        name_list = ["items__subitems", "customers"]
+        self.assertIs(self._callFUT(name_list, include_star=True), self._callFUT(include_star_selection(name_list)))
+
+    def test_merge(self):
+        from django_aggressivequery.namelist import merge_tries
+        trie = merge_tries(self._callFUT(["*", "items__*"]), self._callFUT(["items__name", "customers__name"]))
+        self.assertIs(trie, self._callFUT(["*", "items__*", "items__name", "customers__name"]))
+
+
+class FindRedundantTests(TestCase):
+    def _callFUT(self, name_list):
+        from django_aggressivequery.namelist import find_redundant
+        return find_redundant(name_list)
+
+    def test_it(self):
+        actual = self._callFUT(["user", "user__name", "point", "point", "user__teams__name"])
+        self.assertEqual(actual, [("user", "covered by longer name"), ("point", "duplicated")])
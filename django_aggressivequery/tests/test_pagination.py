@@ -0,0 +1,64 @@
+# -*- coding:utf-8 -*-
+from django.test import TestCase
+from . import models as m
+
+
+class PaginateByKeyTests(TestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery import from_queryset
+        return from_queryset(*args, **kwargs)
+
+    def setUp(self):
+        for i, name in enumerate(["a", "b", "b", "b", "c"]):
+            order = m.Order.objects.create(name=name, price=i)
+            m.Item.objects.create(name="{}-item".format(i), order=order)
+
+    def _collect(self, aqs, order_by, size):
+        pages = []
+        after = None
+        while True:
+            page = aqs.paginate_by_key(order_by, after=after, size=size)
+            pages.append([(o.name, o.price, [item.name for item in o.items.all()]) for o in page.objects])
+            if not page.has_next:
+                self.assertIsNone(page.cursor)
+                return pages
+            after = page.cursor
+
+    def test_it(self):
+        aqs = self._makeOne(m.Order.objects.all(), ["name", "price", "items__name"], more_specific=True)
+        with self.assertNumQueries(6):
+            pages = self._collect(aqs, "name", size=2)
+        self.assertEqual(pages, [
+            [("a", 0, ["0-item"]), ("b", 1, ["1-item"])],
+            [("b", 2, ["2-item"]), ("b", 3, ["3-item"])],
+            [("c", 4, ["4-item"])],
+        ])
+
+    def test_extra_row__not_prefetched(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        aqs = self._makeOne(m.Order.objects.all(), ["name", "items__name"], more_specific=True)
+        with CaptureQueriesContext(connection) as ctx:
+            page = aqs.paginate_by_key("price", size=2)  # price is not in name_list
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertTrue(page.has_next)
+        ids = [str(ob.id) for ob in page.objects]
+        self.assertIn('IN ({})'.format(", ".join(ids)), ctx.captured_queries[1]["sql"])
+
+    def test_descending(self):
+        aqs = self._makeOne(m.Order.objects.all(), ["name", "price"], more_specific=True)
+        pages = self._collect(aqs, ["-name", "price"], size=3)
+        self.assertEqual([[ob[1] for ob in page] for page in pages], [[4, 1, 2], [3, 0]])
+
+    def test_filtered(self):
+        aqs = self._makeOne(m.Order.objects.filter(name="b"), ["name"])
+        pages = self._collect(aqs, "-id", size=2)
+        self.assertEqual([[ob[1] for ob in page] for page in pages], [[3, 2], [1]])
+
+    def test_cursor_with_other_order_by(self):
+        aqs = self._makeOne(m.Order.objects.all(), ["name"])
+        page = aqs.paginate_by_key("name", size=1)
+        with self.assertRaises(ValueError):
+            aqs.paginate_by_key("-name", after=page.cursor, size=1)
+        with self.assertRaises(ValueError):
+            aqs.paginate_by_key("name", after="xxx", size=1)
@@ -0,0 +1,87 @@
+# -*- coding:utf-8 -*-
+from django.test import TestCase
+from . import models as m
+
+
+class LRUCacheTests(TestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery.cache import LRUCache
+        return LRUCache(*args, **kwargs)
+
+    def test_it(self):
+        cache = self._makeOne(maxsize=2)
+        self.assertEqual(cache.get_or_create("a", lambda: 1), 1)
+        self.assertEqual(cache.get_or_create("a", lambda: 2), 1)
+        stats = cache.stats()
+        self.assertEqual((stats.hits, stats.misses, stats.evictions, stats.size), (1, 1, 0, 1))
+
+    def test_eviction__least_recently_used(self):
+        cache = self._makeOne(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.stats().evictions, 1)
+
+
+class FromQuerysetPlanCacheTests(TestCase):
+    def _callFUT(self, *args, **kwargs):
+        from django_aggressivequery import from_queryset
+        return from_queryset(*args, **kwargs)
+
+    def _makeCache(self):
+        from django_aggressivequery.cache import LRUCache
+        return LRUCache(maxsize=8)
+
+    def test_reused__same_name_list(self):
+        cache = self._makeCache()
+        aqs0 = self._callFUT(m.Order.objects.all(), ["items__subitems", "customers"], cache=cache)
+        aqs1 = self._callFUT(m.Order.objects.filter(price__gt=0), ["customers", "items__subitems"], cache=cache)
+        self.assertEqual(str(aqs0.query), str(m.Order.objects.all().query))
+        self.assertIn('"order"."price" > 0', str(aqs1.query))
+        self.assertIs(aqs0.plan, aqs1.plan)
+        self.assertEqual(cache.stats().hits, 1)
+
+    def test_not_reused__more_specific(self):
+        cache = self._makeCache()
+        self._callFUT(m.Order.objects.all(), ["name"], cache=cache).to_queryset()
+        self._callFUT(m.Order.objects.all(), ["name"], more_specific=True, cache=cache).to_queryset()
+        self.assertEqual(cache.stats().hits, 0)
+
+    def test_not_reused__skip_filter(self):
+        cache = self._makeCache()
+        aqs = self._callFUT(m.Customer.objects.all(), ["*__*"], cache=cache)
+        self.assertIn("customerkarma", str(aqs.query))
+        aqs = self._callFUT(m.Customer.objects.all(), ["*__*"], cache=cache).skip_filter(["karma"])
+        self.assertNotIn("customerkarma", str(aqs.query))
+
+    def test_custom_prefetch__queryset_is_not_cached(self):
+        from django.db.models import Prefetch
+        cache = self._makeCache()
+        for price in [0, 10]:
+            aqs = self._callFUT(m.Order.objects.all(), ["valuable_items"], cache=cache).custom_prefetch(
+                valuable_items=Prefetch("items", m.Item.objects.filter(price__gt=price), to_attr="valuable_items")
+            )
+            prefetchs = aqs.to_queryset()._prefetch_related_lookups
+            self.assertIn('"item"."price" > {}'.format(price), str(prefetchs[0].queryset.query))
+        self.assertEqual(cache.stats().hits, 1)
+
+    def test_custom_prefetch__same_name__other_relation(self):
+        from django.db.models import Prefetch
+        cache = self._makeCache()
+        candidates = [
+            ("items", m.Item.objects.all(), m.Item),
+            ("customers", m.Customer.objects.all(), m.Customer),
+        ]
+        for through, qs, model in candidates:
+            aqs = self._callFUT(m.Order.objects.all(), ["related"], cache=cache).custom_prefetch(
+                related=Prefetch(through, qs, to_attr="related")
+            )
+            self.assertEqual([spec.model for spec in aqs.plan.prefetch_list], [model])
+        self.assertEqual(cache.stats().hits, 0)
+
+    def test_without_cache(self):
+        aqs = self._callFUT(m.Order.objects.all(), ["items"], cache=None)
+        self.assertEqual(aqs.to_queryset()._prefetch_related_lookups[0].prefetch_through, "items")
@@ -0,0 +1,96 @@
+# -*- coding:utf-8 -*-
+from django.test import TestCase
+from . import models as m
+
+
+class PrefetchCacheTests(TestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery import from_queryset
+        return from_queryset(*args, **kwargs)
+
+    def _makeCache(self, *args, **kwargs):
+        from django_aggressivequery import PrefetchCache
+        return PrefetchCache(*args, **kwargs)
+
+    def setUp(self):
+        foo = m.Customer.objects.create(name="foo")
+        bar = m.Customer.objects.create(name="bar")
+        order = m.Order.objects.create(name="order-1")
+        m.Item.objects.create(name="order-1-item-a", order=order)
+        order.customers.add(foo)
+        order.customers.add(bar)
+
+    def _describe(self, aqs):
+        return [(c.name, [(o.name, [i.name for i in o.items.all()]) for o in c.orders.all()]) for c in aqs]
+
+    def _query(self, prefetch_cache):
+        return self._makeOne(m.Customer.objects.order_by("id"), ["orders__items"]).prefetch_cache(orders=prefetch_cache)
+
+    def test_it(self):
+        prefetch_cache = self._makeCache()
+        with self.assertNumQueries(3):
+            expected = self._describe(self._query(prefetch_cache))
+        # orders are cached, items are not
+        with self.assertNumQueries(2):
+            self.assertEqual(self._describe(self._query(prefetch_cache)), expected)
+        self.assertEqual((prefetch_cache.hits, prefetch_cache.misses), (1, 1))
+
+    def test_cached_instances_are_not_shared(self):
+        prefetch_cache = self._makeCache()
+        first = list(self._query(prefetch_cache))[0].orders.all()[0]
+        second = list(self._query(prefetch_cache))[0].orders.all()[0]
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+
+    def test_invalidate__post_save(self):
+        prefetch_cache = self._makeCache()
+        self._describe(self._query(prefetch_cache))
+        m.Order.objects.filter(name="order-1").get().save()
+        with self.assertNumQueries(3):
+            self._describe(self._query(prefetch_cache))
+
+    def test_invalidate__m2m_changed(self):
+        prefetch_cache = self._makeCache()
+        self._describe(self._query(prefetch_cache))
+        m.Order.objects.create(name="order-2").customers.add(m.Customer.objects.get(name="foo"))
+        actual = self._describe(self._query(prefetch_cache))
+        self.assertEqual(actual[0], ("foo", [("order-1", ["order-1-item-a"]), ("order-2", [])]))
+
+    def test_unrelated_model__not_invalidated(self):
+        from unittest import mock
+        prefetch_cache = self._makeCache()
+        self._describe(self._query(prefetch_cache))
+        self.assertNotIn("tests.Item", prefetch_cache.labels)
+        with mock.patch.object(prefetch_cache.storage, "incr_version") as incr_version:
+            item = m.Item.objects.get()
+            item.save()
+            m.SubItem.objects.create(name="sub", item=item)
+        self.assertFalse(incr_version.called)
+
+    def test_empty_result(self):
+        prefetch_cache = self._makeCache()
+        aqs = self._makeOne(m.Customer.objects.order_by("id"), ["orders"])
+        aqs = aqs.prefetch_filter(orders=lambda qs: qs.filter(id__in=[])).prefetch_cache(orders=prefetch_cache)
+        with self.assertNumQueries(1):
+            self.assertEqual([list(c.orders.all()) for c in aqs], [[], []])
+        self.assertEqual((prefetch_cache.hits, prefetch_cache.misses), (0, 0))
+
+    def test_ttl(self):
+        prefetch_cache = self._makeCache(ttl=0.01)
+        self._describe(self._query(prefetch_cache))
+        import time
+        time.sleep(0.02)
+        with self.assertNumQueries(3):
+            self._describe(self._query(prefetch_cache))
+
+    def test_django_cache_backend(self):
+        prefetch_cache = self._makeCache(backend="default")
+        self.addCleanup(prefetch_cache.clear)
+        expected = self._describe(self._query(prefetch_cache))
+        with self.assertNumQueries(2):
+            self.assertEqual(self._describe(self._query(prefetch_cache)), expected)
+        m.Item.objects.create(name="order-1-item-b", order=m.Order.objects.get(name="order-1"))  # items are not cached
+        with self.assertNumQueries(2):
+            self._describe(self._query(prefetch_cache))
+        m.Order.objects.get(name="order-1").delete()
+        self.assertEqual(self._describe(self._query(prefetch_cache)), [("foo", []), ("bar", [])])
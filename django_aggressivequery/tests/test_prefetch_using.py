@@ -0,0 +1,66 @@
+# -*- coding:utf-8 -*-
+from django.test import TestCase, TransactionTestCase
+from . import models as m
+
+
+class PrefetchUsingTests(TestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery import from_queryset
+        return from_queryset(*args, **kwargs)
+
+    def _aliases(self, aqs):
+        return [(p.prefetch_to, p.queryset._db) for p in aqs.to_queryset()._prefetch_related_lookups]
+
+    def test_default__router(self):
+        aqs = self._makeOne(m.Customer.objects.all(), ["orders__items"])
+        self.assertEqual(self._aliases(aqs), [("orders", None), ("orders__items", None)])
+
+    def test_following_root(self):
+        aqs = self._makeOne(m.Customer.objects.using("replica"), ["orders__items"])
+        self.assertEqual(self._aliases(aqs), [("orders", "replica"), ("orders__items", "replica")])
+
+    def test_all_paths(self):
+        aqs = self._makeOne(m.Customer.objects.all(), ["orders__items"]).prefetch_using("replica")
+        self.assertEqual(aqs.to_queryset()._db, None)
+        self.assertEqual(self._aliases(aqs), [("orders", "replica"), ("orders__items", "replica")])
+
+    def test_per_path(self):
+        aqs = self._makeOne(m.Customer.objects.using("default"), ["orders__items"]).prefetch_using(orders__items="replica")
+        self.assertEqual(self._aliases(aqs), [("orders", "default"), ("orders__items", "replica")])
+
+    def test_round_robin(self):
+        aqs = self._makeOne(m.Customer.objects.all(), ["orders"]).prefetch_using(orders=["default", "replica"])
+        self.assertEqual([self._aliases(aqs._clone())[0][1] for i in range(3)], ["default", "replica", "default"])
+
+
+# replica is a test mirror of default. data must be committed to be read from other connection
+class PrefetchUsingEvaluationTests(TransactionTestCase):
+    multi_db = True
+
+    def test_it(self):
+        from django_aggressivequery import from_queryset
+        customer = m.Customer.objects.create(name="foo")
+        order = m.Order.objects.create(name="order-1")
+        order.customers.add(customer)
+
+        aqs = from_queryset(m.Customer.objects.all(), ["orders"]).prefetch_using("replica")
+        with self.assertNumQueries(1, using="default"), self.assertNumQueries(1, using="replica"):
+            actual = [(c.name, [o.name for o in c.orders.all()]) for c in aqs]
+        self.assertEqual(actual, [("foo", ["order-1"])])
+        self.assertEqual(list(aqs)[0].orders.all()[0]._state.db, "replica")
+
+    def test_instrumentation(self):
+        from django_aggressivequery import from_queryset
+        from django_aggressivequery.signals import evaluated
+        reports = []
+
+        def receive(sender, aqs, report, **kwargs):
+            reports.append(report)
+        evaluated.connect(receive, sender=m.Customer)
+        self.addCleanup(evaluated.disconnect, receive, sender=m.Customer)
+
+        customer = m.Customer.objects.create(name="foo")
+        m.Order.objects.create(name="order-1").customers.add(customer)
+        list(from_queryset(m.Customer.objects.all(), ["orders"]).prefetch_using("replica"))
+        self.assertEqual([(s.name, s.queries) for s in reports[0].levels], [("", 1), ("orders", 1)])
+        self.assertEqual(reports[0].queries, 2)
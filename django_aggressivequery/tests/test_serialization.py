@@ -0,0 +1,113 @@
+# -*- coding:utf-8 -*-
+import io
+import json
+from django.test import TestCase
+from . import models as m
+
+
+class PlanFileTests(TestCase):
+    def _makeRegistry(self):
+        from django_aggressivequery.registry import QueryRegistry
+        registry = QueryRegistry()
+        registry.register("karma", "tests.CustomerKarma", ["point", "customer__name", "customer__orders__name"], more_specific=True)
+        registry.register("orders", m.Order, ["items__subitems"])
+        return registry
+
+    def _makeCache(self):
+        from django_aggressivequery.cache import LRUCache
+        return LRUCache()
+
+    def _dump(self, registry):
+        from django_aggressivequery.serialization import dump_plans
+        fp = io.StringIO()
+        dump_plans(registry, fp)
+        return fp.getvalue()
+
+    def _callFUT(self, content, cache):
+        from django_aggressivequery.serialization import load_plans
+        return load_plans(io.StringIO(content), cache=cache)
+
+    def test_roundtrip(self):
+        from django_aggressivequery import from_queryset
+        registry = self._makeRegistry()
+        content = self._dump(registry)
+        cache = self._makeCache()
+        report = self._callFUT(content, cache)
+        self.assertEqual(report.loaded, ["karma", "orders"])
+        self.assertEqual(report.rejected, [])
+
+        for query in registry:
+            expected = from_queryset(query.get_model().objects.all(), query.name_list, more_specific=query.more_specific, cache=None)
+            aqs = from_queryset(query.get_model().objects.all(), query.name_list, more_specific=query.more_specific, cache=cache)
+            hits = cache.stats().hits
+            self.assertEqual(aqs.plan, expected.plan)
+            self.assertEqual(cache.stats().hits, hits + 1)
+            self.assertNotIn("result", aqs.optimizer.transaction.__dict__)  # extraction is skipped
+
+    def test_stale__model_is_changed(self):
+        content = json.loads(self._dump(self._makeRegistry()))
+        content["plans"][1]["signatures"]["tests.Item"] = "xxx"
+        cache = self._makeCache()
+        report = self._callFUT(json.dumps(content), cache)
+        self.assertEqual(report.loaded, ["karma"])
+        self.assertEqual(report.rejected, [("orders", "model tests.Item is changed")])
+        self.assertEqual(len(cache), 1)
+
+    def test_stale__model_is_not_found(self):
+        content = json.loads(self._dump(self._makeRegistry()))
+        content["plans"][0]["signatures"]["tests.Removed"] = "xxx"
+        report = self._callFUT(json.dumps(content), self._makeCache())
+        self.assertEqual(report.rejected, [("karma", "model tests.Removed is not found")])
+
+    def test_stale__version(self):
+        content = json.loads(self._dump(self._makeRegistry()))
+        content["version"] = -1
+        cache = self._makeCache()
+        report = self._callFUT(json.dumps(content), cache)
+        self.assertEqual(report.loaded, [])
+        self.assertEqual([name for name, _ in report.rejected], ["karma", "orders"])
+        self.assertEqual(len(cache), 0)
+
+    def test_custom_prefetch__not_serializable(self):
+        from django_aggressivequery import from_queryset
+        from django_aggressivequery.serialization import dump_plan
+        from django.db.models import Prefetch
+        aqs = from_queryset(m.Order.objects.all(), ["positive_items"], cache=None).custom_prefetch(
+            positive_items=Prefetch("items", m.Item.objects.filter(price__gte=0), to_attr="positive_items")
+        )
+        with self.assertRaises(ValueError):
+            dump_plan(aqs.plan)
+
+
+class CommandTests(TestCase):
+    def _callFUT(self, *args, **kwargs):
+        from django.core.management import call_command
+        from django_aggressivequery.management.commands.aggressivequery_plans import Command
+        return call_command(Command(), *args, **kwargs)
+
+    def test_it(self):
+        import os
+        import tempfile
+        from django.core.management import CommandError
+        from django_aggressivequery.registry import default_registry
+        default_registry.register("customer", m.Customer, ["orders__items"])
+        self.addCleanup(default_registry.clear)
+
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        out = io.StringIO()
+        self._callFUT(output=path, stdout=out)
+        self.assertIn("write: 1 plans", out.getvalue())
+
+        out = io.StringIO()
+        self._callFUT(output=path, check=True, stdout=out)
+        self.assertIn("ok: 1 plans", out.getvalue())
+
+        with open(path) as rf:
+            content = json.load(rf)
+        content["plans"][0]["signatures"]["tests.Customer"] = "xxx"
+        with open(path, "w") as wf:
+            json.dump(content, wf)
+        with self.assertRaises(CommandError):
+            self._callFUT(output=path, check=True, stdout=io.StringIO(), stderr=io.StringIO())
@@ -0,0 +1,75 @@
+# -*- coding:utf-8 -*-
+from django.test import TestCase
+from . import models as m
+
+
+class CostBasedStrategyTests(TestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery.strategies import CostBasedStrategy
+        return CostBasedStrategy(*args, **kwargs)
+
+    def _callFUT(self, *args, **kwargs):
+        from django_aggressivequery import from_queryset
+        return from_queryset(*args, cache=None, **kwargs)
+
+    def test_default__many_to_one(self):
+        # without strategy, many to one relation is joined (and prefetched, but already fetched)
+        aqs = self._callFUT(m.CustomerPosition.objects.all(), ["customer"])
+        self.assertEqual(aqs.plan.select_related, ("customer",))
+        self.assertEqual([s.lookup for s in aqs.plan.prefetch_list], ["customer"])
+
+    def test_overrides(self):
+        strategy = self._makeOne(overrides={"customer__karma": ":prefetch"})
+        aqs = self._callFUT(m.CustomerPosition.objects.all(), ["customer__karma"], strategy=strategy)
+        self.assertEqual(aqs.plan.select_related, ("customer",))
+        self.assertEqual([s.lookup for s in aqs.plan.prefetch_list], ["customer__karma"])
+
+    def test_lookup_table__join(self):
+        strategy = self._makeOne(row_estimates={m.CustomerPosition: 100, m.Customer: 10})
+        aqs = self._callFUT(m.CustomerPosition.objects.all(), ["customer"], strategy=strategy)
+        self.assertEqual(aqs.plan.select_related, ("customer",))
+        self.assertEqual(aqs.plan.prefetch_list, ())
+
+    def test_many_parents__prefetch(self):
+        strategy = self._makeOne(row_estimates={"tests.customerposition": 100000, "tests.customer": 10})
+        aqs = self._callFUT(m.CustomerPosition.objects.all(), ["customer"], strategy=strategy)
+        self.assertEqual(aqs.plan.select_related, ())
+        self.assertEqual([s.lookup for s in aqs.plan.prefetch_list], ["customer"])
+
+    def test_without_estimates__default(self):
+        strategy = self._makeOne()
+        aqs = self._callFUT(m.Customer.objects.all(), ["karma"], strategy=strategy)
+        self.assertEqual(aqs.plan.select_related, ("karma",))
+
+    def test_evaluation(self):
+        customer = m.Customer.objects.create(name="foo")
+        m.CustomerKarma.objects.create(customer=customer, point=10)
+        strategy = self._makeOne(overrides={"karma": ":prefetch"})
+        aqs = self._callFUT(m.Customer.objects.all(), ["karma"], strategy=strategy)
+        with self.assertNumQueries(2):
+            self.assertEqual([c.karma.point for c in aqs], [10])
+
+
+class EstimateTableRowsTests(TestCase):
+    def _callFUT(self, model):
+        from django_aggressivequery.strategies import estimate_table_rows
+        return estimate_table_rows(model)
+
+    def test_sqlite(self):
+        from django.db import connection
+        for i in range(3):
+            m.Customer.objects.create(name="foo{}".format(i))
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.assertEqual(self._callFUT(m.Customer), 3)
+
+    def test_failed__in_atomic_block(self):
+        from unittest import mock
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            with mock.patch.object(connection, "vendor", "postgresql"):  # no pg_class on sqlite
+                self.assertIsNone(self._callFUT(m.Customer))
+        self.assertIn("ROLLBACK TO SAVEPOINT", ctx.captured_queries[-2]["sql"])
+        self.assertFalse(connection.needs_rollback)
+        self.assertEqual(m.Customer.objects.count(), 0)
@@ -0,0 +1,93 @@
+# -*- coding:utf-8 -*-
+from django.test import TestCase
+from . import models as m
+
+
+class SubqueryPrefetchTests(TestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery import from_queryset
+        return from_queryset(*args, **kwargs)
+
+    def setUp(self):
+        foo = m.Customer.objects.create(name="foo")
+        m.CustomerKarma.objects.create(point=1, customer=foo)
+        bar = m.Customer.objects.create(name="bar")
+        m.CustomerKarma.objects.create(point=0, customer=bar)
+        m.CustomerPosition.objects.create(name="1st", customer=foo, substitute=bar)
+
+        order1 = m.Order.objects.create(name="order-1")
+        item = m.Item.objects.create(name="order-1-item-a", order=order1, price=10)
+        m.SubItem.objects.create(name="order-1-item-a-sub", item=item)
+        m.Item.objects.create(name="order-1-item-b", order=order1, price=20)
+        order2 = m.Order.objects.create(name="order-2")
+        order1.customers.add(foo)
+        order1.customers.add(bar)
+        order2.customers.add(foo)
+
+    def _describe(self, aqs):
+        return [
+            (k.customer.name, [(o.name, [(i.name, [s.name for s in i.subitems.all()]) for i in o.items.all()]) for o in k.customer.orders.all()])
+            for k in aqs
+        ]
+
+    def test_it(self):
+        qs = m.CustomerKarma.objects.filter(point__gt=0)
+        name_list = ["customer__orders__items__subitems"]
+        expected = self._describe(self._makeOne(qs, name_list))
+
+        aqs = self._makeOne(qs, name_list).prefetch_subquery("customer__orders", "customer__orders__items__subitems")
+        with self.assertNumQueries(4):
+            actual = self._describe(aqs)
+        self.assertEqual(actual, expected)
+        self.assertEqual([s.rows for s in aqs.prefetch_stats], [2, 2, 1])
+
+    def test_subquery_has_no_parameter_list(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        aqs = self._makeOne(m.CustomerKarma.objects.filter(point__gt=0), ["customer__orders__items"])
+        aqs = aqs.prefetch_subquery("customer__orders__items")
+        with CaptureQueriesContext(connection) as ctx:
+            list(aqs)
+        sql = ctx.captured_queries[-1]["sql"]
+        self.assertIn('"item"."order_id" IN (SELECT', sql)
+        self.assertIn('FROM "customerkarma" U0 WHERE U0."point" > 0', sql)
+
+    def test_prefetch_filter__on_parent_level(self):
+        qs = m.Customer.objects.order_by("id")
+        aqs = self._makeOne(qs, ["orders__items"]).prefetch_filter(orders=lambda qs: qs.filter(name="order-1"))
+        expected = [(c.name, [(o.name, [i.name for i in o.items.all()]) for o in c.orders.all()]) for c in aqs]
+        aqs = self._makeOne(qs, ["orders__items"]).prefetch_filter(orders=lambda qs: qs.filter(name="order-1"))
+        aqs = aqs.prefetch_subquery("orders", "orders__items")
+        with self.assertNumQueries(3):
+            actual = [(c.name, [(o.name, [i.name for i in o.items.all()]) for o in c.orders.all()]) for c in aqs]
+        self.assertEqual(actual, expected)
+
+    def test_reverse_foreign_key(self):
+        qs = m.Customer.objects.order_by("id")
+        expected = [(c.name, [p.name for p in c.customerposition_set.all()]) for c in self._makeOne(qs, ["customerposition_set"])]
+        aqs = self._makeOne(qs, ["customerposition_set"]).prefetch_subquery("customerposition_set")
+        with self.assertNumQueries(2):
+            actual = [(c.name, [p.name for p in c.customerposition_set.all()]) for c in aqs]
+        self.assertEqual(actual, expected)
+
+    def test_back_reference(self):
+        aqs = self._makeOne(m.Order.objects.order_by("id"), ["items"]).prefetch_subquery("items")
+        orders = list(aqs)
+        with self.assertNumQueries(0):
+            self.assertEqual([[i.order.name for i in o.items.all()] for o in orders], [["order-1", "order-1"], []])
+            self.assertIs(orders[0].items.all()[0].order, orders[0])
+
+    def test_sliced__fallback(self):
+        aqs = self._makeOne(m.Customer.objects.order_by("id")[:1], ["orders"]).prefetch_subquery("orders")
+        with self.assertNumQueries(2):
+            self.assertEqual([[o.name for o in c.orders.all()] for c in aqs], [["order-1", "order-2"]])
+
+    def test_with_skip_filter(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        aqs = self._makeOne(m.Customer.objects.order_by("id"), ["orders__items"]).skip_filter(["memo1"])
+        aqs = aqs.prefetch_subquery("orders").prefetch_filter(orders=lambda qs: qs.filter(name="order-1"))
+        with CaptureQueriesContext(connection) as ctx:
+            actual = [(c.name, [o.name for o in c.orders.all()]) for c in aqs]
+        self.assertEqual(actual, [("foo", ["order-1"]), ("bar", ["order-1"])])
+        self.assertIn('"order_customers"."customer_id" IN (SELECT', ctx.captured_queries[1]["sql"])
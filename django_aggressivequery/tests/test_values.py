@@ -0,0 +1,63 @@
+# -*- coding:utf-8 -*-
+from django.test import TestCase
+from . import models as m
+
+
+class AsDictsTests(TestCase):
+    def _makeOne(self, *args, **kwargs):
+        from django_aggressivequery import from_queryset
+        return from_queryset(*args, **kwargs)
+
+    def setUp(self):
+        foo = m.Customer.objects.create(name="foo")
+        m.CustomerKarma.objects.create(point=0, customer=foo)
+        bar = m.Customer.objects.create(name="bar")
+        m.CustomerPosition.objects.create(name="1st", customer=foo, substitute=bar)
+
+        order1 = m.Order.objects.create(name="order-1")
+        m.Item.objects.create(name="order-1-item-a", order=order1, price=10)
+        m.Item.objects.create(name="order-1-item-b", order=order1, price=20)
+        order2 = m.Order.objects.create(name="order-2")
+        order1.customers.add(foo)
+        order1.customers.add(bar)
+        order2.customers.add(bar)
+
+    def test_it(self):
+        aqs = self._makeOne(m.Customer.objects.order_by("id"), ["name", "karma__point", "orders__name", "orders__items__name"], more_specific=True)
+        with self.assertNumQueries(3):
+            actual = aqs.as_dicts()
+        expected = [
+            {"name": "foo", "karma": {"point": 0},
+             "orders": [{"name": "order-1", "items": [{"name": "order-1-item-a"}, {"name": "order-1-item-b"}]}]},
+            {"name": "bar", "karma": None,
+             "orders": [{"name": "order-1", "items": [{"name": "order-1-item-a"}, {"name": "order-1-item-b"}]},
+                        {"name": "order-2", "items": []}]},
+        ]
+        self.assertEqual(actual, expected)
+
+    def test_same_as_instances(self):
+        aqs = self._makeOne(m.Item.objects.order_by("id"), ["name", "order__name", "order__customers__name"], more_specific=True)
+        expected = [
+            {"name": item.name, "order": {"name": item.order.name, "customers": [{"name": c.name} for c in item.order.customers.all()]}}
+            for item in aqs
+        ]
+        # order is joined (not prefetched)
+        with self.assertNumQueries(2):
+            self.assertEqual(aqs.as_dicts(), expected)
+
+    def test_prefetch_filter(self):
+        aqs = self._makeOne(m.Order.objects.order_by("id"), ["name", "items__name"], more_specific=True)
+        aqs = aqs.prefetch_filter(items=lambda qs: qs.filter(price__gt=10))
+        self.assertEqual(aqs.as_dicts(), [{"name": "order-1", "items": [{"name": "order-1-item-b"}]}, {"name": "order-2", "items": []}])
+
+    def test_as_tuples(self):
+        aqs = self._makeOne(m.Customer.objects.order_by("id"), ["name", "karma__point", "orders__name"], more_specific=True)
+        self.assertEqual(aqs.as_tuples(), [("foo", (0, ), [("order-1", )]), ("bar", None, [("order-1", ), ("order-2", )])])
+
+    def test_custom_prefetch__not_supported(self):
+        from django.db.models import Prefetch
+        aqs = self._makeOne(m.Order.objects.all(), ["positive_items"]).custom_prefetch(
+            positive_items=Prefetch("items", m.Item.objects.filter(price__gte=0), to_attr="positive_items")
+        )
+        with self.assertRaises(ValueError):
+            aqs.as_dicts()
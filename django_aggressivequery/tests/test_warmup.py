@@ -0,0 +1,41 @@
+# -*- coding:utf-8 -*-
+from django.test import TestCase
+from . import models as m
+
+
+class WarmupTests(TestCase):
+    def _callFUT(self, *args, **kwargs):
+        from django_aggressivequery import warmup
+        return warmup(*args, **kwargs)
+
+    def _makeHintMap(self):
+        from django_aggressivequery.extraction import HintMap
+        return HintMap()
+
+    def test_models(self):
+        hintmap = self._makeHintMap()
+        report = self._callFUT(models=[m.Customer, "tests.Order"], hintmap=hintmap)
+        self.assertEqual(report.models, 2)
+        self.assertEqual(report.plans, 0)
+        self.assertGreaterEqual(report.elapsed, 0)
+        self.assertEqual(set(hintmap.cache.keys()), {m.Customer, m.Order})
+        self.assertEqual(set(hintmap.indexes.keys()), {m.Customer, m.Order})
+
+    def test_all_models(self):
+        from django.apps import apps
+        hintmap = self._makeHintMap()
+        report = self._callFUT(hintmap=hintmap)
+        self.assertEqual(report.models, len(apps.get_models()))
+        self.assertIn(m.SubItem, hintmap.cache)
+
+    def test_queries(self):
+        from django_aggressivequery import from_queryset
+        from django_aggressivequery.cache import LRUCache
+        cache = LRUCache()
+        queries = [(m.Order, ["items"]), ("tests.Customer", ["name", "orders__name"], True)]
+        report = self._callFUT(models=[], queries=queries, cache=cache)
+        self.assertEqual(report.plans, 2)
+
+        hits = cache.stats().hits
+        from_queryset(m.Order.objects.all(), ["items"], cache=cache).plan
+        self.assertEqual(cache.stats().hits, hits + 1)
@@ -0,0 +1,128 @@
+# -*- coding:utf-8 -*-
+import logging
+from collections import defaultdict
+from .structures import join_name
+logger = logging.getLogger(__name__)
+
+
+class _Node(object):
+    """shape of a model's values in a values_list() row (joined models are nested)"""
+    __slots__ = ("model", "pk", "names", "joins", "prefetchs", "children")
+
+    def __init__(self, model, pk):
+        self.model = model
+        self.pk = pk  # index of pk in row
+        self.names = []  # List[(name, index)]
+        self.joins = []  # List[(name, _Node)]
+        self.prefetchs = []  # List[(hint, Result, path)]
+        self.children = []  # List[(name, _Node, many)], prefetched
+
+
+class ValuesLoader(object):
+    """evaluating Result tree with values_list() queries, without model instances
+
+    joins and prefetchs are decided as the plan (Inspector, with strategy), fields are fields of Result.
+    a query per prefetch level, children are grouped by the parent's pk.
+    """
+
+    def __init__(self, aqs):
+        self.aqs = aqs
+        self.inspector = aqs.optimizer.inspector
+        self.extensions = aqs.optimizer.extensions
+
+    def load(self):
+        """-> (list of dicts, root node)"""
+        qs = self.aqs.source_queryset
+        columns = []
+        root = self.collect(qs.model, self.aqs.optimizer.result, "", "", columns)
+        loaded = defaultdict(list)  # Dict[_Node, List[(pk, dict)]]
+        objects = [self.make(root, row, loaded) for row in qs.prefetch_related(None).values_list(*columns)]
+        while loaded:
+            level, loaded = loaded, defaultdict(list)
+            for node, pairs in level.items():
+                for hint, result, path in node.prefetchs:
+                    self.load_prefetch(node, hint, result, path, pairs, loaded)
+        return objects, root
+
+    def collect(self, model, result, path, prefix, columns):
+        node = _Node(model, len(columns))
+        pk_name = model._meta.pk.name
+        columns.append(prefix + pk_name)
+        for f in result.fields:
+            if f.name == pk_name:
+                node.names.append((f.name, node.pk))
+            else:
+                node.names.append((f.name, len(columns)))
+                columns.append(prefix + f.name)
+        for hint, sr in self.inspector.collect_joins(result, path=path):
+            name = join_name(path, hint.name)
+            node.joins.append((hint.name, self.collect(hint.rel_model, sr, name, prefix + hint.name + "__", columns)))
+        joined = {name for name, _ in node.joins}
+        for hint, sr in self.inspector.collect_prefetch_list(result, path=path):
+            if hint.name in joined:  # many to one relation, prefetching joined objects is no-op
+                continue
+            if hasattr(hint, "type"):  # custom hint
+                raise ValueError("{}: custom_prefetch is not supported without model instances".format(join_name(path, hint.name)))
+            node.prefetchs.append((hint, sr, join_name(path, hint.name)))
+        return node
+
+    def make(self, node, row, loaded):
+        pk = row[node.pk]
+        if pk is None:  # not joined
+            return None
+        ob = {name: row[i] for name, i in node.names}
+        for name, sub in node.joins:
+            ob[name] = self.make(sub, row, loaded)
+        if node.prefetchs:
+            loaded[node].append((pk, ob))
+        return ob
+
+    def prefetch_queryset(self, hint, path):
+        qs = hint.rel_model.objects.all()
+        if self.aqs.source_queryset._db is not None:  # following the alias of root queryset, as the plan
+            qs = qs.using(self.aqs.source_queryset._db)
+        for extension in self.extensions.with_type(":prefetch"):
+            qs = extension.apply(qs, path)
+        return qs
+
+    def load_prefetch(self, node, hint, result, path, pairs, loaded):
+        query_name = get_query_name(hint)
+        qs = self.prefetch_queryset(hint, path)
+        columns = [query_name]
+        child = self.collect(hint.rel_model, result, path, "", columns)
+        many = is_many(hint)
+        node.children.append((hint.name, child, many))
+
+        groups = defaultdict(list)
+        qs = qs.filter(**{query_name + "__in": list({pk for pk, _ in pairs})})
+        for row in qs.values_list(*columns):
+            ob = self.make(child, row, loaded)
+            groups[row[0]].append(ob)
+        logger.debug("@values: %r, parents=%r, rows=%r", path, len(pairs), sum(len(xs) for xs in groups.values()))
+        for pk, ob in pairs:
+            children = groups.get(pk, [])
+            ob[hint.name] = children if many else (children[0] if children else None)
+
+
+def get_query_name(hint):
+    """lookup name from related model to hint's model. (e.g. Item -> Order is "order")"""
+    if hint.is_reverse_related:  # forward field
+        return hint.field.related_query_name()
+    else:
+        return hint.field.field.name
+
+
+def is_many(hint):
+    return hint.field.many_to_many or hint.field.one_to_many
+
+
+def as_tuple(node, ob):
+    """dict (made by ValuesLoader) -> tuple, in order of fields, joined and prefetched relations"""
+    if ob is None:
+        return None
+    values = [ob[name] for name, _ in node.names]
+    values.extend(as_tuple(sub, ob[name]) for name, sub in node.joins)
+    for name, child, many in node.children:
+        v = ob[name]
+        values.append([as_tuple(child, x) for x in v] if many else as_tuple(child, v))
+    return tuple(values)
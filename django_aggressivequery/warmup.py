@@ -0,0 +1,46 @@
+# -*- coding:utf-8 -*-
+import time
+import logging
+from collections import namedtuple
+from django.apps import apps
+from . import extraction
+from .cache import default_plan_cache
+logger = logging.getLogger(__name__)
+
+
+WarmupReport = namedtuple(
+    "WarmupReport",
+    "models, plans, elapsed"
+)
+
+
+def warmup(models=None, queries=None, cache=default_plan_cache, hintmap=None):
+    """loading all models' hints (and their indexes) and compiling declared queries, before the first request.
+
+    queries is a list of (model, name_list) or (model, name_list, more_specific).
+    model is a model class or "<app_label>.<ModelName>".
+    """
+    from . import from_queryset
+
+    st = time.time()
+    hintmap = hintmap or extraction.default_hintmap
+    models = apps.get_models() if models is None else [_get_model(m) for m in models]
+    for model in models:
+        hintmap.load(model)
+        hintmap.index(model)  # classification of relations, used by Inspector.choose()
+
+    n = 0
+    for query in queries or []:
+        model, name_list, more_specific = _get_model(query[0]), query[1], (query[2] if len(query) > 2 else False)
+        from_queryset(model.objects.all(), name_list, more_specific=more_specific, cache=cache).plan
+        n += 1
+
+    report = WarmupReport(models=len(models), plans=n, elapsed=time.time() - st)
+    logger.info("warmup: models=%d, plans=%d, elapsed=%.4fs", report.models, report.plans, report.elapsed)
+    return report
+
+
+def _get_model(model):
+    if isinstance(model, str):
+        return apps.get_model(model)
+    return model